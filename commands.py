@@ -0,0 +1,143 @@
+"""Terminal commands - a registry of the commands that can be typed."""
+
+from collections import namedtuple
+
+from completion import Trie
+
+
+class UsageError(Exception):
+
+    """Exception raised when a command is given the wrong arguments."""
+
+    pass
+
+
+class Command(namedtuple('Command', ['name', 'run', 'args', 'help', 'usage',
+                                     'subcommands'],
+                         defaults=[(), None, None, None])):
+
+    """
+    A command that can be typed at the terminal.
+
+    run is called with the words after the command name, each converted by
+    the matching function in args. If there are the wrong number of words,
+    the line isn't treated as this command. If a word can't be converted, a
+    UsageError is raised with the usage message. If args is None, run is
+    given the words as they are and checks them itself, returning False if
+    they aren't a use of this command.
+
+    Commands without help aren't listed by the help command, or completed.
+    subcommands is a CommandRegistry of commands that can follow this one's
+    name, or None.
+
+    """
+
+    __slots__ = ()
+
+
+class CommandRegistry:
+
+    """
+    Commands indexed by name.
+
+    Looking up a command is a single dict lookup, however many commands are
+    registered. The help listing and the trie of names used for completion
+    are built once, the first time they're needed after a command is
+    registered.
+
+    """
+
+    def __init__(self, commands=()):
+        """Initialize the class."""
+        self._commands = {}
+        self._unlisted = set()
+        self._help = None
+        self._trie = None
+        for command in commands:
+            self.register(command)
+
+    def __contains__(self, name):
+        """Indicate whether there's a command with the given name."""
+        return name in self._commands
+
+    def register(self, command, aliases=(), listed=True):
+        """
+        Add a command, which can also be run by any of its aliases.
+
+        If listed is False, the command is completed but left out of the help
+        listing.
+
+        """
+        for name in (command.name,) + tuple(aliases):
+            self._commands[name] = command
+        if not listed:
+            self._unlisted.add(command.name)
+        self._help = None
+        self._trie = None
+
+    def names(self):
+        """Get the names of the commands that can be completed."""
+        return [name for name, c in self._commands.items()
+                if c.help is not None and c.name == name]
+
+    def help(self):
+        """Get the help listing, as a list of lines."""
+        if self._help is None:
+            self._help = (["Available commands:"] +
+                          ["  {:10}   {}".format(n, self._commands[n].help)
+                           for n in sorted(self.names())
+                           if n not in self._unlisted])
+        return self._help
+
+    def complete(self, words, partial):
+        """
+        Complete the last word of a partly typed command line.
+
+        words are the whole words typed before the partial one, which can be
+        subcommand names. Returns the longest common prefix of the matches,
+        and a list of the matches.
+
+        """
+        if words:
+            command = self._commands.get(words[0])
+            if command is None or command.subcommands is None:
+                return partial, []
+            return command.subcommands.complete(words[1:], partial)
+
+        if self._trie is None:
+            self._trie = Trie(self.names())
+        return self._trie.complete(partial)
+
+    def dispatch(self, words):
+        """
+        Run the command for a list of typed words.
+
+        Returns False if the words aren't a command. Raises UsageError if the
+        command's arguments can't be converted.
+
+        """
+        command = self._commands.get(words[0])
+        if command is None:
+            return False
+
+        args = words[1:]
+        if (args and command.subcommands is not None and
+                args[0] in command.subcommands):
+            return command.subcommands.dispatch(args)
+
+        if command.args is None:
+            return command.run(*args) is not False
+        if len(args) != len(command.args):
+            return False
+
+        try:
+            values = [convert(a) for convert, a in zip(command.args, args)]
+        except ValueError:
+            raise UsageError(command.usage or
+                             "Usage: {}".format(
+                                 " ".join([command.name] +
+                                          ["<{}>".format(a.__name__)
+                                           for a in command.args])))
+
+        command.run(*values)
+        return True
@@ -0,0 +1,62 @@
+"""Completion - find the words that partly typed input could be."""
+
+import os
+
+
+class Trie:
+
+    """
+    A prefix tree of words, for completing partly typed words.
+
+    Each node keeps the sorted words that pass through it, and their longest
+    common prefix, so completing a prefix only walks the prefix itself.
+
+    """
+
+    def __init__(self, words):
+        """Initialize the class."""
+        self._root = _Node()
+        for word in sorted(set(words)):
+            node = self._root
+            node.words.append(word)
+            for char in word:
+                node = node.children.setdefault(char, _Node())
+                node.words.append(word)
+
+        self._root.finish()
+
+    def complete(self, prefix):
+        """
+        Get the completions of a prefix.
+
+        Returns the longest common prefix of the words starting with prefix,
+        and a list of those words. If there are none, returns the prefix and
+        an empty list.
+
+        """
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return prefix, []
+
+        return node.common, node.words
+
+
+class _Node:
+
+    """A node of a trie, for the words starting with a given prefix."""
+
+    __slots__ = ('children', 'words', 'common')
+
+    def __init__(self):
+        """Initialize the class."""
+        self.children = {}
+        self.words = []
+        self.common = ''
+
+    def finish(self):
+        """Work out the common prefixes, once all the words are added."""
+        self.common = os.path.commonprefix(self.words)
+        for child in self.children.values():
+            child.finish()
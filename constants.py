@@ -11,3 +11,13 @@ GAMENAME = "The Terminal"
 VERSION = 0.1
 VERSION_STRING = 'v{}'.format(VERSION)
 MANUAL_URL = 'https://juzley.github.io/game-off-2016/manual.html'
+
+# Frame rates, in frames per second.
+TARGET_FPS = 60
+IDLE_FPS = 10
+BACKGROUND_FPS = 4
+
+# The length of a simulation step in ms, and the most steps to run in a single
+# frame when catching up.
+STEP_MS = 10
+MAX_FRAME_STEPS = 50
@@ -0,0 +1,70 @@
+"""Dependencies - which of a level's programs must be completed first."""
+
+
+class DependencyError(Exception):
+
+    """Exception raised for dependencies that could never all be met."""
+
+    pass
+
+
+class DependencyGraph:
+
+    """
+    Dependencies between named items, compiled into a DAG.
+
+    Compiling checks that every dependency is one of the items, and that
+    there are no cycles, so that every item can be reached by completing
+    the others in some order.
+
+    The items that block each item are then kept up to date as items are
+    completed, so checking whether an item is blocked is a single lookup.
+
+    """
+
+    def __init__(self, depends):
+        """
+        Compile a dict mapping every item to a list of the items it needs.
+
+        Raises DependencyError if the dependencies are invalid.
+
+        """
+        # For each item, the items that still block it, in the order they
+        # were listed, and the items that it blocks.
+        self._blockers = {}
+        self._dependents = {item: [] for item in depends}
+        for item, needs in depends.items():
+            self._blockers[item] = dict.fromkeys(needs)
+            for need in self._blockers[item]:
+                if need not in self._dependents:
+                    raise DependencyError(
+                        "{} depends on unknown {}".format(item, need))
+                self._dependents[need].append(item)
+
+        # Check every item can be reached, by repeatedly taking the items that
+        # nothing left blocks. Any items that are never taken are in a cycle,
+        # or depend on one.
+        waiting = {item: len(b) for item, b in self._blockers.items()}
+        reached = [item for item, count in waiting.items() if count == 0]
+        for item in reached:
+            for dependent in self._dependents[item]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    reached.append(dependent)
+
+        if len(reached) < len(depends):
+            raise DependencyError("Dependency cycle blocks {}".format(
+                ", ".join(sorted(i for i, c in waiting.items() if c > 0))))
+
+    def is_blocked(self, item):
+        """Indicate whether an item depends on any uncompleted items."""
+        return bool(self._blockers[item])
+
+    def blocked_by(self, item):
+        """Get the items blocking an item, in the order they were listed."""
+        return list(self._blockers[item])
+
+    def complete(self, item):
+        """Mark an item as completed, unblocking anything waiting on it."""
+        for dependent in self._dependents[item]:
+            self._blockers[dependent].pop(item, None)
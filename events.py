@@ -0,0 +1,50 @@
+"""Game events - let parts of the game react to each other without polling."""
+
+from collections import defaultdict
+from enum import Enum, unique
+
+
+@unique
+class GameEvent(Enum):
+
+    """
+    The types of event, and the arguments they're published with.
+
+    PROGRAM_COMPLETED   program
+    PROGRAM_FAILED      program, reason
+    PROGRAM_EXITED      program - when it exits without being completed
+    FROZEN              ms the terminal is frozen for
+    TIME_PENALTY        secs taken off the countdown
+    LOCKED              (none) - when the countdown runs out
+
+    """
+
+    PROGRAM_COMPLETED = 1
+    PROGRAM_FAILED = 2
+    PROGRAM_EXITED = 3
+    FROZEN = 4
+    TIME_PENALTY = 5
+    LOCKED = 6
+
+
+class EventBus:
+
+    """Class that calls subscribed functions when events are published."""
+
+    def __init__(self):
+        """Initialize the class."""
+        self._subscribers = defaultdict(list)
+
+    def subscribe(self, event, func):
+        """Call func with the event's arguments whenever it's published."""
+        self._subscribers[event].append(func)
+
+    def unsubscribe(self, event, func):
+        """Stop calling func for an event."""
+        self._subscribers[event].remove(func)
+
+    def publish(self, event, *args):
+        """Publish an event, calling its subscribers in order."""
+        # Copy the list, so subscribers can unsubscribe while it's published.
+        for func in list(self._subscribers[event]):
+            func(*args)
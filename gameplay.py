@@ -1,43 +1,50 @@
 """Implementation of the core gameplay."""
 
+import logging
 import random
 
 import pygame
 
 import timer
 import util
+import screen
 import menu
 import constants
+import snapshot
 from gamestate import GameState
 from terminal import Terminal
 from resources import load_font
 
 
-class SuccessState(GameState):
+class _EndState(GameState):
 
-    """Gamestate implementation for the success screen."""
+    """
+    Base class for the screens shown when a game ends.
+
+    These show a message over the terminal's bezel, followed after a wait by
+    a prompt to continue.
+
+    """
 
     _FONT = constants.TERMINAL_FONT
-    _WAIT_TIME = 1000
     _MAIN_TEXT_HEIGHT = 50
     _CONTINUE_TEXT_HEIGHT = 20
     _SPACING = 10
 
-    def __init__(self, mgr, terminal):
+    # How long to wait before showing the continue prompt, in ms.
+    _WAIT_TIME = 0
+
+    def __init__(self, mgr, terminal, text, continue_text, colour):
         """Initialize the class."""
         self._mgr = mgr
         self._timer = timer.Timer()
         self._terminal = terminal
 
-        font = load_font(SuccessState._FONT,
-                         SuccessState._MAIN_TEXT_HEIGHT)
-        self._login_text = font.render('Access Granted', True,
-                                       constants.TEXT_COLOUR)
+        font = load_font(self._FONT, self._MAIN_TEXT_HEIGHT)
+        self._login_text = font.render(text, True, colour)
 
-        font = load_font(SuccessState._FONT,
-                         SuccessState._CONTINUE_TEXT_HEIGHT)
-        self._continue_text = font.render('Press any key to continue', True,
-                                          constants.TEXT_COLOUR)
+        font = load_font(self._FONT, self._CONTINUE_TEXT_HEIGHT)
+        self._continue_text = font.render(continue_text, True, colour)
 
         self._login_text_coords = util.center_align(
             self._login_text.get_rect().w,
@@ -46,17 +53,52 @@ class SuccessState(GameState):
         self._continue_text_coords = (coords[0],
                                       self._login_text_coords[1] +
                                       self._login_text.get_rect().h +
-                                      SuccessState._SPACING)
+                                      self._SPACING)
+
+        # Whether the continue text was showing after the last draw, None if
+        # the screen needs a full redraw.
+        self._drawn_continue = None
 
     def draw(self):
-        """Draw the losing screen."""
+        """Draw the screen."""
+        show_continue = self._timer.time >= self._WAIT_TIME
+        if self._drawn_continue is None:
+            screen.repaint(None, self._paint)
+            rects = None
+        else:
+            rects = self._terminal.bezel_damage()
+            if show_continue != self._drawn_continue:
+                rects.append(self._continue_text.get_rect().move(
+                    self._continue_text_coords))
+            screen.repaint(rects, self._paint)
+
+        self._drawn_continue = show_continue
+        return rects
+
+    def invalidate(self):
+        """Force a full redraw."""
+        self._drawn_continue = None
+
+    def _paint(self):
+        """Paint the whole screen."""
+        screen.get_surface().fill((0, 0, 0))
         self._terminal.draw_bezel()
-        pygame.display.get_surface().blit(self._login_text,
-                                          self._login_text_coords)
+        screen.compose(self._login_text, self._login_text_coords)
 
-        if self._timer.time >= SuccessState._WAIT_TIME:
-            pygame.display.get_surface().blit(self._continue_text,
-                                              self._continue_text_coords)
+        if self._timer.time >= self._WAIT_TIME:
+            screen.compose(self._continue_text, self._continue_text_coords)
+
+
+class SuccessState(_EndState):
+
+    """Gamestate implementation for the success screen."""
+
+    _WAIT_TIME = 1000
+
+    def __init__(self, mgr, terminal):
+        """Initialize the class."""
+        super().__init__(mgr, terminal, 'Access Granted',
+                         'Press any key to continue', constants.TEXT_COLOUR)
 
     def run(self, events):
         """Run the win-game screen."""
@@ -67,56 +109,35 @@ class SuccessState(GameState):
                 self._mgr.pop_until(menu.MainMenu)
 
 
-class LostState(GameState):
+class LostState(_EndState):
 
     """Gamestate implementation for the defeat screen."""
 
     _WAIT_TIME = 2000
-    _FONT = constants.TERMINAL_FONT
-    _MAIN_TEXT_HEIGHT = 50
-    _CONTINUE_TEXT_HEIGHT = 20
-    _SPACING = 10
-
-    def __init__(self, mgr, terminal):
-        """Initialize the class."""
-        self._mgr = mgr
-        self._timer = timer.Timer()
-        self._terminal = terminal
-
-        font = load_font(LostState._FONT,
-                         LostState._MAIN_TEXT_HEIGHT)
-        self._login_text = font.render('You have been locked out', True,
-                                       constants.TEXT_COLOUR_RED)
 
-        font = load_font(LostState._FONT,
-                         LostState._CONTINUE_TEXT_HEIGHT)
-        self._continue_text = font.render('Press any key to continue', True,
-                                          constants.TEXT_COLOUR_RED)
+    def __init__(self, mgr, terminal, restart):
+        """
+        Initialize the class.
 
-        self._login_text_coords = util.center_align(
-            self._login_text.get_rect().w,
-            self._login_text.get_rect().h + self._continue_text.get_rect().h)
-        coords = util.center_align(self._continue_text.get_rect().w, 0)
-        self._continue_text_coords = (coords[0],
-                                      self._login_text_coords[1] +
-                                      self._login_text.get_rect().h +
-                                      LostState._SPACING)
+        restart is called to put the terminal back to the start of the game,
+        if the player chooses to retry.
 
-    def draw(self):
-        """Draw the losing screen."""
-        self._terminal.draw_bezel()
-        pygame.display.get_surface().blit(self._login_text,
-                                          self._login_text_coords)
-
-        if self._timer.time >= LostState._WAIT_TIME:
-            pygame.display.get_surface().blit(self._continue_text,
-                                              self._continue_text_coords)
+        """
+        super().__init__(mgr, terminal, 'You have been locked out',
+                         'Press R to retry, or any other key to continue',
+                         constants.TEXT_COLOUR_RED)
+        self._restart = restart
 
     def run(self, events):
         """Run the lost-game screen."""
         self._timer.update()
         if self._timer.time >= LostState._WAIT_TIME:
-            if len([e for e in events if e.type == pygame.KEYDOWN]) > 0:
+            keys = [e.key for e in events if e.type == pygame.KEYDOWN]
+            if pygame.K_r in keys:
+                # Go back to the game, as it was at the start.
+                self._restart()
+                self._mgr.pop()
+            elif keys:
                 # Return to the main menu.
                 self._mgr.pop_until(menu.MainMenu)
 
@@ -125,10 +146,55 @@ class GameplayState(GameState):
 
     """Gamestate implementation for the core gameplay."""
 
-    def __init__(self, mgr, level_info):
-        """Initialize the class."""
+    # How often the game is autosaved, in ms of game time.
+    _AUTOSAVE_INTERVAL = 10000
+
+    def __init__(self, mgr, level_info, saved=None):
+        """
+        Initialize the class.
+
+        If saved is given, it's an autosaved game state to resume, rather than
+        starting the level afresh. Raises SnapshotError if it can't be
+        restored.
+
+        """
         self._level_info = level_info
+        self._mgr = mgr
+
+        if saved is None:
+            self._terminal = GameplayState._create_terminal(level_info)
+
+            # Keep a snapshot of the start of the game, so that it can be
+            # restarted instantly, with the same programs.
+            self._start = self._terminal.snapshot()
+        else:
+            self._terminal = Terminal.from_snapshot(saved['terminal'])
+            self._start = saved['start']
+
+        self._next_autosave = (self._terminal.time +
+                               GameplayState._AUTOSAVE_INTERVAL)
+
+    @staticmethod
+    def resume(mgr):
+        """
+        Create the gamestate for the autosaved game, if there is one.
 
+        Returns None if there's no autosaved game, or it can't be restored.
+
+        """
+        saved = snapshot.load_autosave()
+        if saved is None:
+            return None
+
+        try:
+            return GameplayState(mgr, saved['level'], saved)
+        except snapshot.SnapshotError as e:
+            logging.warning('Could not resume autosaved game: %s', e)
+            return None
+
+    @staticmethod
+    def _create_terminal(level_info):
+        """Create a terminal for a level, picking its programs at random."""
         # The level file specifies programs with groups, where each group
         # contains a list of possible programs, and the number of programs to
         # use from that group. Here we pick the programs that we're going to
@@ -170,11 +236,24 @@ class GameplayState(GameState):
         for g in groups.values():
             programs.update(g)
 
-        self._terminal = Terminal(
+        return Terminal(
             programs=programs,
             time=level_info['time'],
             depends=depends)
-        self._mgr = mgr
+
+    def restart(self):
+        """Go back to the start of the game."""
+        self._terminal.restore(self._start)
+        self._next_autosave = (self._terminal.time +
+                               GameplayState._AUTOSAVE_INTERVAL)
+
+    def _autosave(self):
+        """Save the game, so that it can be resumed if the game crashes."""
+        snapshot.autosave({'level': self._level_info,
+                           'start': self._start,
+                           'terminal': self._terminal.snapshot()})
+        self._next_autosave = (self._terminal.time +
+                               GameplayState._AUTOSAVE_INTERVAL)
 
     def run(self, events):
         """Run the game."""
@@ -185,7 +264,7 @@ class GameplayState(GameState):
                     self._mgr.push(menu.PauseMenu(self._mgr,
                                                   self._terminal))
                 else:
-                    self._terminal.on_keypress(e.key, e.unicode)
+                    self._terminal.on_keypress(e.key, e.unicode, e.mod)
             elif e.type == pygame.KEYUP:
                 self._terminal.on_keyrelease()
             elif e.type == pygame.MOUSEBUTTONDOWN:
@@ -203,15 +282,38 @@ class GameplayState(GameState):
         if self._terminal.locked:
             # Push so that we can restart the game if required by just popping
             # again.
-            self._mgr.push(LostState(self._mgr, self._terminal))
+            snapshot.clear_autosave()
+            self._mgr.push(LostState(self._mgr, self._terminal, self.restart))
 
         # The player has succeeded, switch to the success gamestate.
-        if self._terminal.completed():
+        elif self._terminal.completed():
             # Don't need to return to the game, so replace this gamestate with
             # the success screen.
+            snapshot.clear_autosave()
             menu.LevelMenu.completed_level(self._level_info['id'])
             self._mgr.replace(SuccessState(self._mgr, self._terminal))
 
+        elif (snapshot.autosaving() and
+              self._terminal.time >= self._next_autosave):
+            self._autosave()
+
     def draw(self):
         """Draw the game."""
-        self._terminal.draw()
+        return self._terminal.draw()
+
+    def invalidate(self):
+        """Force a full redraw."""
+        self._terminal.invalidate()
+
+    @property
+    def busy(self):
+        """Indicate whether the game needs a full frame rate."""
+        return self._terminal.busy
+
+    @property
+    def profile_label(self):
+        """Get a label for this gamestate, including the running program."""
+        program = self._terminal.current_program
+        if program is None:
+            return super().profile_label
+        return '{}/{}'.format(super().profile_label, type(program).__name__)
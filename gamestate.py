@@ -1,5 +1,7 @@
 """Module responsible for switching between different gamestates."""
 
+import timer
+
 
 class GameState:
 
@@ -10,7 +12,27 @@ class GameState:
         pass
 
     def draw(self):
-        """Draw the gamestate."""
+        """
+        Draw the gamestate.
+
+        Returns a list of the screen rects that were changed, or None if the
+        whole screen was redrawn.
+
+        """
+
+    def invalidate(self):
+        """Forget what is on screen, so that the next draw is a full redraw."""
+        pass
+
+    @property
+    def busy(self):
+        """Indicate whether the gamestate has time-critical work to do."""
+        return False
+
+    @property
+    def profile_label(self):
+        """Get a label for this gamestate in profiling output."""
+        return type(self).__name__
 
 
 class GameStateManager:
@@ -24,6 +46,9 @@ class GameStateManager:
         # therefore, is at the end of the list.
         self._states = []
 
+        # The gamestate that drew the last frame.
+        self._drawn_state = None
+
     def push(self, gamestate):
         """Push a new gamestate onto the stack."""
         self._states.append(gamestate)
@@ -48,10 +73,42 @@ class GameStateManager:
         if self._states:
             self._states[-1].run(events)
 
+    def step(self, events, ms):
+        """Advance the simulation by a single step of a given length."""
+        timer.advance(ms)
+        self.run(events)
+
     def draw(self):
-        """Draw the current gamestate."""
-        if self._states:
-            self._states[-1].draw()
+        """
+        Draw the current gamestate.
+
+        Returns the list of screen rects that changed, or None if the whole
+        screen changed.
+
+        """
+        if not self._states:
+            return []
+
+        # Whatever is on screen belongs to the previous gamestate if the
+        # current one has changed since the last draw.
+        state = self._states[-1]
+        if state is not self._drawn_state:
+            state.invalidate()
+            self._drawn_state = state
+
+        return state.draw()
+
+    def invalidate(self):
+        """Force the current gamestate to redraw the whole screen."""
+        self._drawn_state = None
+
+    def busy(self):
+        """Indicate whether the current gamestate needs a full frame rate."""
+        return bool(self._states) and self._states[-1].busy
+
+    def profile_label(self):
+        """Get the profiling label of the current gamestate."""
+        return self._states[-1].profile_label if self._states else ''
 
     def empty(self):
         """Indicate whether there are any active gamestates."""
@@ -1,49 +1,403 @@
 """Entry point for the game."""
 
 
+import argparse
 import pygame
 import random
+import time
 
 import constants
+import history
+import snapshot
+import inputfilter
 import mouse
-from gamestate import GameStateManager
-from menu import SplashScreen
+import screen
+import sessions
+import timer
+from menu import LevelMenu, SplashScreen
+from profiler import FrameProfiler
+from recording import Recorder, Replay
 from resources import load_image
+from scheduler import FrameScheduler
+from script import InputScript
 
 
-def setup():
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=constants.GAMENAME)
+    parser.add_argument('--fps', type=_parse_fps,
+                        default=constants.TARGET_FPS,
+                        help='target frame rate while playing')
+    parser.add_argument('--idle-fps', type=_parse_fps,
+                        default=constants.IDLE_FPS,
+                        help='frame rate when there is no input')
+    parser.add_argument('--background-fps', type=_parse_fps,
+                        default=constants.BACKGROUND_FPS,
+                        help='frame rate when the window is in the background')
+    parser.add_argument('--window-size', type=_parse_size,
+                        help='initial window size, e.g. 1600x1200')
+    parser.add_argument('--fullscreen', action='store_true',
+                        help='fill the screen, scaling the game to fit')
+    parser.add_argument('--renderer', metavar='DRIVER',
+                        help="present frames with SDL's renderer, using the "
+                             "given render driver, e.g. opengl or software, "
+                             "or 'auto' for the best available")
+    parser.add_argument('--sessions', type=_parse_sessions, default=1,
+                        help='the number of games to run at once, each in '
+                             'its own part of the window')
+    parser.add_argument('--speed', type=_parse_speed, default=1,
+                        help='simulation speed multiplier')
+    parser.add_argument('--headless', action='store_true',
+                        help='run as fast as possible without a display')
+    parser.add_argument('--script',
+                        help='in headless mode, a file of scripted input to '
+                             'feed to the game')
+    parser.add_argument('--frame-steps', type=int,
+                        help='in headless mode, the number of simulation '
+                             'steps per drawn frame, 0 to never draw '
+                             '(default 1)')
+    parser.add_argument('--max-steps', type=int,
+                        help='in headless mode, stop after this many '
+                             'simulation steps')
+    parser.add_argument('--seed', type=int,
+                        help='seed for the random number generator')
+    parser.add_argument('--record',
+                        help='record the session to a file')
+    parser.add_argument('--replay',
+                        help='replay a recorded session, instead of taking '
+                             'input from the player')
+    parser.add_argument('--history', default='history.txt',
+                        help='the file to keep the command history in, '
+                             'which isn\'t used for headless, recorded or '
+                             'replayed sessions')
+    parser.add_argument('--progress', default='progress.json',
+                        help='the file to keep level progress in, which '
+                             'isn\'t used for headless, recorded or '
+                             'replayed sessions')
+    parser.add_argument('--autosave', default='autosave.dat',
+                        help='the file to autosave games in progress to, '
+                             'which isn\'t used for headless, recorded, '
+                             'replayed or multiple sessions')
+    parser.add_argument('--profile-frames', type=int, default=1000,
+                        help='the number of frames kept by the profiler')
+    parser.add_argument('--profile-csv',
+                        help='on exit, write the profiled frames to a CSV '
+                             'file')
+    args = parser.parse_args()
+
+    # The headless options have no defaults here, so that they can be
+    # reported if they're given without --headless.
+    if not args.headless:
+        for option in ('script', 'frame_steps', 'max_steps'):
+            if getattr(args, option) is not None:
+                parser.error('--{} can only be used with --headless'.format(
+                    option.replace('_', '-')))
+    if args.frame_steps is None:
+        args.frame_steps = 1
+    if args.max_steps is None:
+        args.max_steps = 0
+
+    return args
+
+
+def _parse_size(arg):
+    """Parse a size given as WIDTHxHEIGHT."""
+    try:
+        width, height = (int(v) for v in arg.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'size must be WIDTHxHEIGHT, not {}'.format(arg))
+    return width, height
+
+
+def _parse_fps(arg):
+    """Parse a frame rate."""
+    fps = int(arg)
+    if fps < 1:
+        raise argparse.ArgumentTypeError(
+            'frame rate must be at least 1, not {}'.format(fps))
+    return fps
+
+
+def _parse_speed(arg):
+    """Parse a simulation speed multiplier."""
+    speed = float(arg)
+    if not speed > 0:
+        raise argparse.ArgumentTypeError(
+            'speed must be more than 0, not {}'.format(speed))
+    return speed
+
+
+def _parse_sessions(arg):
+    """Parse a number of sessions."""
+    count = int(arg)
+    if count < 1:
+        raise argparse.ArgumentTypeError(
+            'there must be at least 1 session, not {}'.format(count))
+    return count
+
+
+def setup(args):
     """Perform initial setup."""
-    pygame.init()
-    pygame.display.set_mode([800, 600],
-                            pygame.DOUBLEBUF | pygame.HWSURFACE,
-                            24)
-    pygame.display.set_icon(load_image("media/icon.png"))
-    pygame.display.set_caption(constants.GAMENAME)
+    screen.init(sessions.screen_size(args.sessions),
+                headless=args.headless,
+                window_size=args.window_size,
+                fullscreen=args.fullscreen,
+                renderer=args.renderer)
+    screen.set_icon(load_image("media/icon.png"))
+    screen.set_caption(constants.GAMENAME)
+    inputfilter.restrict_queue()
     mouse.current.set_cursor(mouse.Cursor.ARROW)
-    random.seed()
 
 
-def run():
+def run(args):
     """Run the game loop."""
-    gamestates = GameStateManager()
-    gamestates.push(SplashScreen(gamestates))
+    replay = (Replay(args.replay, constants.STEP_MS, args.sessions)
+              if args.replay else None)
+
+    # All of the game's randomness comes from the global generator, so seeding
+    # it is enough to make a session reproducible from its input.
+    if replay is not None:
+        seed = replay.seed
+    elif args.seed is not None:
+        seed = args.seed
+    else:
+        seed = random.randrange(2 ** 32)
+    random.seed(seed)
+
+    recorder = (Recorder(args.record, seed, constants.STEP_MS, args.sessions)
+                if args.record else None)
+
+    # Only interactive sessions keep their history and level progress, as
+    # otherwise what earlier sessions did would change what recorded input
+    # does, and replays would change the player's saved progress.
+    if not (args.headless or args.record or replay is not None):
+        history.open_store(args.history)
+        LevelMenu.open_progress(args.progress)
+
+    # Likewise for autosaves, which also can't tell several sessions apart.
+    if not (args.headless or args.record or replay is not None or
+            args.sessions > 1):
+        snapshot.open_autosave(args.autosave)
+
+    gamestates = sessions.SessionManager(args.sessions, SplashScreen)
+    profiler = FrameProfiler(args.profile_frames)
+
+    try:
+        if replay is not None:
+            _run_replay(gamestates, profiler, recorder, replay, args)
+        elif args.headless:
+            _run_headless(gamestates, profiler, recorder, args)
+        else:
+            _run_windowed(gamestates, profiler, recorder, args)
+    finally:
+        if recorder is not None:
+            recorder.close()
+        history.close_store()
+        snapshot.close_autosave()
+
+    if args.profile_csv:
+        profiler.dump(args.profile_csv)
+
+
+def _step(gamestates, profiler, recorder, events, ms):
+    """Run a single simulation step."""
+    if recorder is not None:
+        recorder.step(events)
+    gamestates.step(events, ms)
+    profiler.add_step()
+
+
+def _draw(gamestates, profiler):
+    """Draw the current gamestate and the profiler overlay."""
+    with profiler.stage('draw'):
+        rects = gamestates.draw()
+    with profiler.stage('overlay'):
+        overlay_rects = profiler.draw()
+
+    return rects + overlay_rects if rects is not None else None
+
+
+def _handle_profiler_keys(gamestates, profiler, events):
+    """Let the profiler handle its keys, returning the remaining events."""
+    overlay = profiler.overlay
+    events = profiler.handle_events(events)
+
+    # Hiding the overlay leaves it on screen until the gamestate redraws.
+    if overlay and not profiler.overlay:
+        gamestates.invalidate()
+
+    return events
+
+
+def _handle_window_events(gamestates, events):
+    """Handle events that affect the window rather than the gamestates."""
+    for e in events:
+        if e.type == pygame.WINDOWSIZECHANGED:
+            screen.resize()
+        elif e.type == pygame.WINDOWCLOSE:
+            # SDL only sends a quit event when the last window closes, but the
+            # renderer leaves the display module's hidden window open.
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+        elif e.type == pygame.VIDEOEXPOSE:
+            # The window has been uncovered, so its contents need redrawing.
+            gamestates.invalidate()
+
+
+def _run_windowed(gamestates, profiler, recorder, args):
+    """Run the game loop in real time, drawing to the display."""
+    scheduler = FrameScheduler(target_fps=args.fps,
+                               idle_fps=args.idle_fps,
+                               background_fps=args.background_fps)
+    stepper = timer.FixedStep(step_ms=constants.STEP_MS,
+                              max_steps=constants.MAX_FRAME_STEPS,
+                              speed=args.speed)
+
+    # Events are held until the next simulation step, which might not be
+    # until a later frame if frames are being drawn faster than the
+    # simulation rate.
+    pending = []
 
     running = True
     while running:
-        events = pygame.event.get()
-        gamestates.run(events)
+        # Time spent waiting for the next frame is idle, so isn't profiled.
+        events = scheduler.next_frame(busy=gamestates.busy())
+        profiler.begin_frame()
+        if recorder is not None:
+            recorder.begin_frame()
+
+        with profiler.stage('events'):
+            events = _handle_profiler_keys(gamestates, profiler, events)
+            pending.extend(events)
+
+        with profiler.stage('run'):
+            for _ in range(stepper.steps_due()):
+                _step(gamestates, profiler, recorder,
+                      inputfilter.process(pending), stepper.step_ms)
+                pending = []
+                if gamestates.empty():
+                    break
+
+        _handle_window_events(gamestates, events)
 
         if any(e.type == pygame.QUIT for e in events) or gamestates.empty():
             # An empty GameStateManager indicates that the main menu was popped,
             # and we should exit.
             running = False
         else:
-            screen = pygame.display.get_surface()
-            screen.fill((0, 0, 0))
-            gamestates.draw()
-            pygame.display.flip()
+            rects = _draw(gamestates, profiler)
+            with profiler.stage('present'):
+                screen.present(rects)
+            profiler.end_frame(gamestates.profile_label())
+
+        if recorder is not None:
+            recorder.end_frame()
+
+
+def _run_headless(gamestates, profiler, recorder, args):
+    """Run the game loop as fast as possible, without presenting frames."""
+    script = InputScript(args.script) if args.script else None
+    steps = 0
+    frames = 0
+    start = time.perf_counter()
+
+    running = True
+    while running:
+        profiler.begin_frame()
+        if recorder is not None:
+            recorder.begin_frame()
+
+        with profiler.stage('events'):
+            events = pygame.event.get()
+            if script is not None:
+                events.extend(script.events(timer.get_ticks()))
+            events = _handle_profiler_keys(gamestates, profiler,
+                                           inputfilter.process(events))
+
+        with profiler.stage('run'):
+            _step(gamestates, profiler, recorder, events, constants.STEP_MS)
+        steps += 1
+
+        if (any(e.type == pygame.QUIT for e in events) or
+                gamestates.empty() or
+                (script is not None and script.finished) or
+                steps == args.max_steps):
+            running = False
+        elif args.frame_steps and steps % args.frame_steps == 0:
+            screen.present(_draw(gamestates, profiler))
+            frames += 1
+
+        profiler.end_frame(gamestates.profile_label())
+        if recorder is not None:
+            recorder.end_frame()
+
+    _print_throughput(steps, frames, time.perf_counter() - start)
+
+
+def _run_replay(gamestates, profiler, recorder, replay, args):
+    """
+    Run the game loop with input from a recorded session.
+
+    Each recorded frame runs the same simulation steps as it did when it was
+    recorded. In windowed mode frames are also started at the recorded times,
+    to reproduce the pacing of the original session, but in headless mode
+    they are run as fast as possible.
+
+    """
+    steps = 0
+    frames = 0
+    start = time.perf_counter()
+    start_ticks = pygame.time.get_ticks()
+
+    for frame_time, frame_steps in replay.frames():
+        if not args.headless:
+            delay = start_ticks + frame_time - pygame.time.get_ticks()
+            if delay > 0:
+                pygame.time.wait(delay)
+
+        profiler.begin_frame()
+        if recorder is not None:
+            recorder.begin_frame()
+
+        # Live input is ignored, other than to quit or use the profiler.
+        with profiler.stage('events'):
+            events = _handle_profiler_keys(gamestates, profiler,
+                                           pygame.event.get())
+
+        with profiler.stage('run'):
+            for step_events in frame_steps:
+                _step(gamestates, profiler, recorder, step_events,
+                      constants.STEP_MS)
+                steps += 1
+                events.extend(e for e in step_events
+                              if e.type == pygame.QUIT)
+
+        if recorder is not None:
+            recorder.end_frame()
+
+        _handle_window_events(gamestates, events)
+
+        if any(e.type == pygame.QUIT for e in events) or gamestates.empty():
+            break
+
+        rects = _draw(gamestates, profiler)
+        with profiler.stage('present'):
+            screen.present(rects)
+        profiler.end_frame(gamestates.profile_label())
+        frames += 1
+
+    _print_throughput(steps, frames, time.perf_counter() - start)
+
+
+def _print_throughput(steps, frames, elapsed):
+    """Print how fast the simulation and drawing ran."""
+    print('{} steps ({}s of game time) and {} frames in {:.2f}s: '
+          '{:.0f} steps/s, {:.0f} frames/s'.format(
+              steps, steps * constants.STEP_MS // 1000, frames, elapsed,
+              steps / elapsed, frames / elapsed))
 
 
 if __name__ == '__main__':
-    setup()
-    run()
+    args = parse_args()
+    setup(args)
+    run(args)
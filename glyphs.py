@@ -0,0 +1,145 @@
+"""Glyph atlases - draw text from pre-rendered glyphs."""
+
+import functools
+import itertools
+import string
+
+import pygame
+
+import screen
+from resources import load_font
+
+# A dict mapping (font filename, size, colour, background) to the atlas for
+# that style.
+_atlases = {}
+
+
+def load_atlas(filename, size, colour, background=(0, 0, 0)):
+    """Get the glyph atlas for a font, size and colour."""
+    key = (filename, size, tuple(colour), tuple(background))
+    if key not in _atlases:
+        _atlases[key] = GlyphAtlas(load_font(filename, size), colour,
+                                   background)
+    return _atlases[key]
+
+
+class GlyphAtlas:
+
+    """
+    A font's glyphs rendered once, in a single colour on an opaque background.
+
+    The printable ASCII characters are rendered into one surface up front.
+    Any other character is rendered the first time it's drawn. Text drawn on
+    a Canvas is copied a glyph at a time by the renderer, from the atlas
+    uploaded once as a texture, with each glyph at its advance from the
+    previous one. This only matches what the font itself renders for fonts
+    without kerning, like the terminal font.
+
+    Blitting a glyph at a time onto a surface is slower than the font
+    rendering the whole line, so lines drawn on a surface are rendered by the
+    font instead. Long lines are rendered onto the background, which is
+    cheaper for them, and short ones with alpha, so text should only be drawn
+    on the background colour. The rendered lines are cached, so a line
+    that's drawn again, e.g. while the cursor blinks, is a single blit.
+
+    """
+
+    _PRELOAD_CHARS = (string.ascii_letters + string.digits +
+                      string.punctuation + " ")
+
+    # The length of line from which it's cheaper for the font to render onto
+    # the background than with alpha.
+    _OPAQUE_RENDER_LENGTH = 24
+
+    # The number of rendered lines to keep.
+    _LINE_CACHE_SIZE = 256
+
+    def __init__(self, font, colour, background):
+        """Initialize the class."""
+        self._font = font
+        self._colour = colour
+        self._background = background
+        self.height = font.get_height()
+
+        # Dicts mapping each character to its advance, and to the surface and
+        # area to blit it from.
+        self._advances = {}
+        self._glyphs = {}
+
+        renders = [(c, font.render(c, True, colour))
+                   for c in GlyphAtlas._PRELOAD_CHARS]
+        self._atlas = screen.make_surface(
+            (sum(r.get_width() for _, r in renders), self.height))
+        self._atlas.fill(background)
+
+        x_coord = 0
+        for char, render in renders:
+            self._atlas.blit(render, (x_coord, 0))
+            self._glyphs[char] = (self._atlas,
+                                  pygame.Rect((x_coord, 0), render.get_size()))
+            self._advances[char] = self._advance(char)
+            x_coord += render.get_width()
+
+        self.render = functools.lru_cache(
+            maxsize=GlyphAtlas._LINE_CACHE_SIZE)(self._render_line)
+
+    def advance(self, char):
+        """Get the horizontal distance from one character to the next."""
+        if char not in self._advances:
+            self._add_glyph(char)
+        return self._advances[char]
+
+    def size(self, text):
+        """Get the size of some text, as Font.size() would."""
+        try:
+            return sum(map(self._advances.__getitem__, text)), self.height
+        except KeyError:
+            return sum(self.advance(c) for c in text), self.height
+
+    def draw(self, surface, text, pos):
+        """Draw some text onto a surface, with its top left at pos."""
+        if not text:
+            return
+
+        if isinstance(surface, screen.Canvas):
+            # The renderer copies each glyph from the atlas's texture, which
+            # is cheaper than uploading a rendered line.
+            surface.blits(self._glyph_blits(text, pos))
+        else:
+            surface.blit(self.render(text), pos)
+
+    def _render_line(self, text):
+        """Render a line of text with the font."""
+        if len(text) < GlyphAtlas._OPAQUE_RENDER_LENGTH:
+            return self._font.render(text, True, self._colour)
+        return self._font.render(text, True, self._colour, self._background)
+
+    def _glyph_blits(self, text, pos):
+        """Get the (surface, pos, area) blits that draw text from glyphs."""
+        for char in text:
+            if char not in self._glyphs:
+                self._add_glyph(char)
+
+        x_coords = itertools.accumulate(
+            map(self._advances.__getitem__, text), initial=pos[0])
+        return [(self._glyphs[c][0], (x, pos[1]), self._glyphs[c][1])
+                for c, x in zip(text, x_coords)]
+
+    def _add_glyph(self, char):
+        """Render a character that wasn't in the atlas."""
+        render = self._font.render(char, True, self._colour)
+        glyph = screen.make_surface(render.get_size())
+        glyph.fill(self._background)
+        glyph.blit(render, (0, 0))
+        self._glyphs[char] = (glyph, glyph.get_rect())
+        self._advances[char] = self._advance(char)
+
+    def _advance(self, char):
+        """Get a character's advance from the font."""
+        metrics = self._font.metrics(char)
+        if metrics and metrics[0] is not None:
+            return metrics[0][4]
+
+        # The font doesn't have the character, so fall back to what it
+        # renders instead.
+        return self._font.size(char)[0]
@@ -0,0 +1,187 @@
+"""Command history - commands typed at any terminal, kept between runs."""
+
+import logging
+import os
+import queue
+import threading
+
+# The history shared by every terminal. This only lives in memory unless
+# open_store() is called first.
+_store = None
+
+
+def open_store(filename):
+    """Keep the shared command history in a file, from now on."""
+    global _store
+    close_store()
+    _store = HistoryStore(filename)
+
+
+def get_store():
+    """Get the shared command history."""
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
+
+
+def close_store():
+    """Finish writing the shared command history, if it's kept in a file."""
+    if _store is not None:
+        _store.close()
+
+
+class HistoryStore:
+
+    """
+    A list of commands, oldest first, optionally kept in a file.
+
+    The file has one command per line and is only ever appended to, except
+    that once it holds twice as many commands as are kept, it's rewritten
+    with just the kept ones. It's read the first time the commands are
+    needed. Writes are done by a background thread, so the game never waits
+    on the disk.
+
+    An index of which commands contain each character is kept for searching,
+    so a search only looks at commands that could match.
+
+    """
+
+    _MAX_COMMANDS = 1000
+
+    def __init__(self, filename=None):
+        """Initialize the class."""
+        self._filename = filename
+
+        # The commands, and a dict mapping each character to the ascending
+        # indices of the commands that contain it. Both are None until the
+        # file has been read.
+        self._commands = None
+        self._index = None
+
+        # The number of times the oldest commands have been dropped. Each
+        # time, the remaining commands' indices change.
+        self.trims = 0
+
+        # The number of lines in the file.
+        self._file_lines = 0
+
+        # Writes queued for the writer thread. Each item is a function that
+        # does the write, or None to stop the thread.
+        self._writes = queue.Queue()
+        self._writer = None
+
+    @property
+    def commands(self):
+        """Get the list of commands, oldest first."""
+        if self._commands is None:
+            self._load()
+        return self._commands
+
+    def add(self, cmd):
+        """Add a command, unless it repeats the last one."""
+        commands = self.commands
+        if commands and commands[-1] == cmd:
+            return
+
+        commands.append(cmd)
+        for char in set(cmd):
+            self._index.setdefault(char, []).append(len(commands) - 1)
+
+        if self._filename is None:
+            if len(commands) > HistoryStore._MAX_COMMANDS * 2:
+                self._trim()
+            return
+
+        self._file_lines += 1
+        if self._file_lines > HistoryStore._MAX_COMMANDS * 2:
+            self._trim()
+            self._file_lines = len(commands)
+            self._write(self._rewrite, list(commands))
+        else:
+            self._write(self._append, cmd)
+
+    def search(self, query, within=None):
+        """
+        Find the commands containing query, as a list of ascending indices.
+
+        If within is given, only those indices are searched. This is meant to
+        be the result of a search for the start of the query, so a search
+        that's narrowed a character at a time never looks at a command twice.
+        The indices are only valid until trims changes.
+
+        """
+        commands = self.commands
+        if within is None:
+            within = (self._index.get(query[0], []) if query
+                      else range(len(commands)))
+        return [i for i in within if query in commands[i]]
+
+    def close(self):
+        """Finish any writes that are still queued."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _load(self):
+        """Read the commands from the file."""
+        lines = []
+        if self._filename is not None:
+            try:
+                with open(self._filename, encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                # There's no history yet.
+                pass
+            except (OSError, UnicodeDecodeError) as e:
+                logging.warning('Could not read history file: %s', e)
+
+        self._file_lines = len(lines)
+        self._commands = [l for l in lines if l]
+        self._trim()
+
+    def _trim(self):
+        """Drop the oldest commands beyond those kept, and reindex the rest."""
+        del self._commands[:-HistoryStore._MAX_COMMANDS]
+        self.trims += 1
+        self._index = {}
+        for idx, cmd in enumerate(self._commands):
+            for char in set(cmd):
+                self._index.setdefault(char, []).append(idx)
+
+    def _write(self, func, arg):
+        """Queue a write for the writer thread, starting it if need be."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer,
+                                            name='history-writer',
+                                            daemon=True)
+            self._writer.start()
+        self._writes.put((func, arg))
+
+    def _run_writer(self):
+        """Do the queued writes, until told to stop."""
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+
+            func, arg = item
+            try:
+                func(arg)
+            except OSError as e:
+                logging.warning('Could not write history file: %s', e)
+
+    def _append(self, cmd):
+        """Add a command to the end of the file."""
+        with open(self._filename, 'a', encoding='utf-8') as f:
+            f.write(cmd + '\n')
+
+    def _rewrite(self, commands):
+        """Replace the file with just the given commands."""
+        # Write to a new file and move it over the old one, so that the
+        # history isn't lost if the game stops part way through.
+        temp = self._filename + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.writelines(cmd + '\n' for cmd in commands)
+        os.replace(temp, self._filename)
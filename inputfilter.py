@@ -0,0 +1,60 @@
+"""Input pre-processing - trim events down to what the game needs."""
+
+import pygame
+
+import screen
+
+# The event types that gamestates handle.
+HANDLED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP,
+                  pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION,
+                  pygame.ACTIVEEVENT, pygame.VIDEOEXPOSE)
+
+# Event types that aren't handled by gamestates: the game loop handles window
+# resizing and closing, and pygame needs the rest on the queue to generate the
+# handled events. Keypresses get their unicode from text input events, and
+# active and expose events are derived from window events.
+_SUPPORT_EVENTS = (pygame.TEXTINPUT, pygame.TEXTEDITING,
+                   pygame.WINDOWSHOWN, pygame.WINDOWHIDDEN,
+                   pygame.WINDOWEXPOSED, pygame.WINDOWMINIMIZED,
+                   pygame.WINDOWRESIZED, pygame.WINDOWSIZECHANGED,
+                   pygame.WINDOWMAXIMIZED, pygame.WINDOWRESTORED,
+                   pygame.WINDOWENTER, pygame.WINDOWLEAVE,
+                   pygame.WINDOWFOCUSGAINED, pygame.WINDOWFOCUSLOST,
+                   pygame.WINDOWCLOSE)
+
+
+def restrict_queue():
+    """Stop pygame queueing events that the game doesn't use."""
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(list(HANDLED_EVENTS + _SUPPORT_EVENTS))
+
+
+def process(events):
+    """
+    Filter a batch of events down to those the game handles.
+
+    Any number of mouse motion events are collapsed into the last one, so
+    that hit-testing mouse movement costs the same however fast the mouse is
+    moving. Clicks carry their own position, so are unaffected.
+
+    Mouse positions are converted from the window to the logical surface that
+    gamestates draw to.
+
+    """
+    last_motion = None
+    for idx, event in enumerate(events):
+        if event.type == pygame.MOUSEMOTION:
+            last_motion = idx
+
+    return [_to_logical(e) for idx, e in enumerate(events)
+            if e.type in HANDLED_EVENTS and
+            (e.type != pygame.MOUSEMOTION or idx == last_motion)]
+
+
+def _to_logical(event):
+    """Convert the position of a mouse event to logical coordinates."""
+    if event.type not in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN):
+        return event
+
+    return pygame.event.Event(event.type, event.dict,
+                              pos=screen.to_logical(event.pos))
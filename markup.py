@@ -0,0 +1,177 @@
+"""Terminal markup - parse lines of output into styled spans."""
+
+import functools
+import itertools
+import os
+import re
+from collections import namedtuple
+
+import constants
+from resources import load_font, make_path
+
+# The colour codes that can be used with the colour command.
+COLOURS = {
+    "g": constants.TEXT_COLOUR,
+    "r": constants.TEXT_COLOUR_RED,
+    "w": constants.TEXT_COLOUR_WHITE,
+}
+
+# The directory of the fonts that can be used with the font command.
+_FONT_DIR = 'media/fonts'
+
+# The number of parsed lines to keep, for lines that are generated again every
+# frame, such as program output and the current line.
+_CACHE_SIZE = 512
+
+# A markup command, which changes the style of the rest of the line:
+#   <c code>   Change the colour to one of the COLOURS codes.
+#   <s size>   Change the font size. Only used with the font command.
+#   <f name>   Change the font to the font file at name, which must be one of
+#              the files in _FONT_DIR.
+_COMMAND = re.compile(r'<([csf]) ([^>]+?)>')
+
+
+class Span(namedtuple('Span', ['text', 'colour', 'font'])):
+
+    """
+    A run of text in a single style.
+
+    colour is None for the terminal's text colour, which can change, so is
+    only looked up when the span is drawn. font is None for the terminal
+    font.
+
+    """
+
+    __slots__ = ()
+
+
+class StyledLine(namedtuple('StyledLine', ['spans'])):
+
+    """A line of terminal output, as a tuple of spans."""
+
+    __slots__ = ()
+
+    @property
+    def text(self):
+        """Get the text of the line, without any styling."""
+        return ''.join(s.text for s in self.spans)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def parse(line):
+    """
+    Parse a line of output, which may contain markup commands.
+
+    Commands affect the text after them, and can appear anywhere in the line.
+    Anything that looks like a command but isn't valid is left as text.
+
+    """
+    spans = []
+    colour = None
+    size = constants.TERMINAL_TEXT_SIZE
+    fontname = None
+
+    text = ''
+    pos = 0
+    for m in _COMMAND.finditer(line):
+        cmd, arg = m.groups()
+        if cmd == 'c' and arg not in COLOURS:
+            continue
+        if cmd == 's' and not arg.isdigit():
+            continue
+        if cmd == 'f' and not _is_font(arg):
+            continue
+
+        text += line[pos:m.start()]
+        pos = m.end()
+        if text:
+            spans.append(Span(text, colour, _font(fontname, size)))
+            text = ''
+
+        if cmd == 'c':
+            colour = COLOURS[arg]
+        elif cmd == 's':
+            size = int(arg)
+        else:
+            fontname = arg
+
+    # There's always a final span, even if it's empty, so that the line has
+    # the height of its last font.
+    spans.append(Span(text + line[pos:], colour, _font(fontname, size)))
+    return StyledLine(tuple(spans))
+
+
+def plain(line):
+    """Make a styled line from text without parsing it, such as user input."""
+    return StyledLine((Span(line, None, None),))
+
+
+@functools.lru_cache(maxsize=None)
+def _is_font(fontname):
+    """Indicate whether a font command's name is one of the game's fonts."""
+    return (os.path.dirname(fontname) == _FONT_DIR and
+            os.path.isfile(make_path(fontname)))
+
+
+def _font(fontname, size):
+    """Get the font for a span, or None for the terminal font."""
+    # The size is only used with a font command, which might come after it.
+    return load_font(fontname, size) if fontname else None
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def wrap(line, width, font):
+    """
+    Split a styled line into rows no wider than width, breaking at spaces.
+
+    font is the terminal font, used to measure spans that don't have their
+    own. Words too long to fit on a row are broken where they reach the edge.
+    Returns a tuple of StyledLines, from the top row down.
+
+    """
+    if sum(_span_width(s, font) for s in line.spans) <= width:
+        return (line,)
+
+    # Lay out every character of the line, tagged with its span.
+    chars = [(c, span) for span in line.spans for c in span.text]
+    advances = [(span.font or font).size(c)[0] for c, span in chars]
+
+    rows = []
+    start = 0
+    while start < len(chars):
+        x_coord = 0
+        end = start
+        space = None
+        while end < len(chars) and x_coord + advances[end] <= width:
+            if chars[end][0] == ' ':
+                space = end
+            x_coord += advances[end]
+            end += 1
+
+        if end == len(chars):
+            rows.append(_row(chars[start:]))
+            break
+        elif space is not None and space > start:
+            # Break at the last space, which is dropped.
+            rows.append(_row(chars[start:space]))
+            start = space + 1
+        else:
+            # Always take at least one character, so that this finishes
+            # even if a single character doesn't fit.
+            end = max(end, start + 1)
+            rows.append(_row(chars[start:end]))
+            start = end
+
+    return tuple(rows)
+
+
+def _span_width(span, font):
+    """Get the width of a span, using font if it doesn't have its own."""
+    return (span.font or font).size(span.text)[0]
+
+
+def _row(chars):
+    """Rebuild a StyledLine from a run of (character, span) tuples."""
+    return StyledLine(tuple(
+        Span(''.join(c for c, _ in group), span.colour, span.font)
+        for span, group in itertools.groupby(chars, lambda c: c[1])))
@@ -1,9 +1,11 @@
 """Level select menu."""
 
 
+import copy
 import json
 import programs
 from . import menu
+from dependencies import DependencyError, DependencyGraph
 from enum import Enum, unique
 from gameplay import GameplayState
 from resources import make_path
@@ -18,7 +20,11 @@ class LevelMenu(menu.CLIMenu):
         BACK = 1
 
     _LEVELS_FILE = 'media/levels.json'
-    _PROGRESS_FILE = 'progress.json'
+
+    # The file that level progress is kept in. Progress only lives in memory,
+    # in _progress, unless open_progress() is called first.
+    _progress_file = None
+    _progress = {}
 
     def __init__(self, mgr):
         """Initialize the class."""
@@ -33,6 +39,15 @@ class LevelMenu(menu.CLIMenu):
                     for program_info in group['programs']:
                         program_info[1] = getattr(programs, program_info[1])
 
+                # Check that the level's groups can all be unlocked, so that
+                # a bad level fails when it's loaded rather than when played.
+                try:
+                    DependencyGraph({name: group.get('dependent_on', [])
+                                     for name, group in
+                                     lvl['program_groups'].items()})
+                except DependencyError as e:
+                    raise DependencyError("{}: {}".format(lvl['name'], e))
+
         # Load progress information.
         progress = LevelMenu._get_progress()
         completed = progress.get('completed', [])
@@ -67,11 +82,19 @@ class LevelMenu(menu.CLIMenu):
 
         super().__init__(mgr, buf)
 
+    @staticmethod
+    def open_progress(filename):
+        """Keep level progress in a file, from now on."""
+        LevelMenu._progress_file = filename
+
     @staticmethod
     def _get_progress():
-        """Load the current level progress from disk."""
+        """Load the current level progress."""
+        if LevelMenu._progress_file is None:
+            return copy.deepcopy(LevelMenu._progress)
+
         try:
-            with open(LevelMenu._PROGRESS_FILE, 'r') as f:
+            with open(LevelMenu._progress_file, 'r') as f:
                 return json.load(f)
         except (FileNotFoundError, ValueError):
             # The file may not be found if this is the first time the game is
@@ -88,7 +111,11 @@ class LevelMenu(menu.CLIMenu):
             completed.append(lvl_id)
         progress['completed'] = completed
 
-        with open(LevelMenu._PROGRESS_FILE, 'w') as f:
+        if LevelMenu._progress_file is None:
+            LevelMenu._progress = progress
+            return
+
+        with open(LevelMenu._progress_file, 'w') as f:
             json.dump(progress, f)
 
     def _on_choose(self, item):
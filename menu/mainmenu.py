@@ -2,8 +2,10 @@
 
 
 import constants
+import snapshot
 from .menu import CLIMenu, CLIMenuItem
 from .level import LevelMenu
+from gameplay import GameplayState
 from enum import Enum, unique
 
 
@@ -14,7 +16,8 @@ class MainMenu(CLIMenu):
     @unique
     class Items(Enum):
         START_GAME = 1
-        QUIT = 2
+        RESUME = 2
+        QUIT = 3
 
     def __init__(self, mgr):
         """Initialize the class."""
@@ -29,11 +32,24 @@ class MainMenu(CLIMenu):
             CLIMenuItem('    start', '$ start', MainMenu.Items.START_GAME),
             CLIMenuItem('    exit', '$ exit', MainMenu.Items.QUIT)
         ]
+
+        # Offer to resume the last game, if it was left unfinished.
+        if snapshot.has_autosave():
+            buf.insert(-1, CLIMenuItem('    resume', '$ resume',
+                                       MainMenu.Items.RESUME))
         super().__init__(mgr, buf)
 
     def _on_choose(self, item):
         if item == MainMenu.Items.START_GAME:
             self._mgr.push(LevelMenu(self._mgr))
+        elif item == MainMenu.Items.RESUME:
+            gameplay = GameplayState.resume(self._mgr)
+            if gameplay is not None:
+                self._mgr.push(gameplay)
+            else:
+                # The game has ended or can't be restored, so rebuild the menu
+                # without it.
+                self._mgr.replace(MainMenu(self._mgr))
         elif item == MainMenu.Items.QUIT:
             # The main menu should be the last gamestate on the stack, so
             # popping it should cause the game to exit.
@@ -4,6 +4,7 @@
 import pygame
 import util
 import mouse
+import screen
 import constants
 from gamestate import GameState
 from resources import load_font
@@ -26,7 +27,7 @@ class MenuItem:
 
         # Handle alignment
         text_width = self._text.get_rect()[2]
-        surface_width = pygame.display.get_surface().get_rect()[2]
+        surface_width = screen.get_surface().get_rect()[2]
         if align == util.Align.LEFT:
             self._pos = (0, self._pos[1])
         elif align == util.Align.CENTER:
@@ -35,18 +36,22 @@ class MenuItem:
         else:
             self._pos = (surface_width - text_width, self._pos[1])
 
+    @property
+    def rect(self):
+        """The screen rect covered by this menu item."""
+        return self._text.get_rect().move(self._pos)
+
     def collidepoint(self, pos):
         """Determine whether a given point is within this menu item."""
-        return self._text.get_rect().move(self._pos).collidepoint(pos)
+        return self.rect.collidepoint(pos)
 
     def draw(self, selected):
         """Draw the menu item."""
-        screen = pygame.display.get_surface()
-
+        # Items can be drawn over the bezel, so they're composed with it.
         if selected:
-            screen.blit(self._selected_text, self._pos)
+            screen.compose(self._selected_text, self._pos)
         else:
-            screen.blit(self._text, self._pos)
+            screen.compose(self._text, self._pos)
 
 
 class Menu(GameState):
@@ -63,6 +68,10 @@ class Menu(GameState):
         self._items = items
         self._selected_index = 0
 
+        # The selected index when the menu was last drawn, None if the menu
+        # needs a full redraw.
+        self._drawn_index = None
+
     def run(self, events):
         """Handle events."""
         for event in events:
@@ -75,6 +84,35 @@ class Menu(GameState):
 
     def draw(self):
         """Draw the menu."""
+        if self._drawn_index is None:
+            screen.repaint(None, self._paint)
+            rects = None
+        else:
+            rects = self._damage()
+            if self._drawn_index != self._selected_index:
+                rects.extend([self._items[self._drawn_index].rect,
+                              self._items[self._selected_index].rect])
+            screen.repaint(rects, self._paint)
+
+        self._drawn_index = self._selected_index
+        return rects
+
+    def invalidate(self):
+        """Force a full redraw."""
+        self._drawn_index = None
+
+    def _damage(self):
+        """Override to report changes to anything drawn behind the menu."""
+        return []
+
+    def _draw_background(self):
+        """Override to draw anything behind the menu items."""
+        pass
+
+    def _paint(self):
+        """Paint the whole menu."""
+        screen.get_surface().fill((0, 0, 0))
+        self._draw_background()
         for idx, item in enumerate(self._items):
             item.draw(idx == self._selected_index)
 
@@ -149,6 +187,10 @@ class CLIMenu(GameState):
         self._items = []
         self._cmds = {}
 
+        # The selected index when the menu was last drawn, None if the menu
+        # needs a full redraw.
+        self._drawn_index = None
+
         # Create a '<' image to mark the selected item.
         self._select_marker = self._font.render(' <', True,
                                                 CLIMenu._TEXT_COLOUR)
@@ -192,6 +234,23 @@ class CLIMenu(GameState):
                               disabled))
             y_coord += CLIMenu._TEXT_SIZE
 
+        # Work out the areas that change when the selection moves: the line
+        # for each item along with its selection marker, and the area
+        # covering any of the command strings.
+        self._item_rects = {
+            item: line.get_rect().move(coords).union(
+                self._select_marker.get_rect().move(
+                    coords[0] + line.get_rect().w, coords[1]))
+            for line, coords, item, _ in self._buf if item is not None}
+        self._cmd_rect = pygame.Rect(CLIMenu._CMD_TEXT_POS, (0, 0)).unionall(
+            [c.get_rect().move(CLIMenu._CMD_TEXT_POS)
+             for c in self._cmds.values()])
+
+        # Only the lines associated with enabled menu items can be hit.
+        self._hit_rects = [(line.get_rect().move(coords), item)
+                           for line, coords, item, disabled in self._buf
+                           if item is not None and not disabled]
+
     def run(self, events):
         """Handle events."""
         for event in events:
@@ -204,25 +263,48 @@ class CLIMenu(GameState):
 
     def draw(self):
         """Draw the menu."""
+        if self._drawn_index is None:
+            screen.repaint(None, self._paint)
+            rects = None
+        elif self._drawn_index != self._selected_index:
+            # Only the old and new selected items, and the command string,
+            # have changed.
+            rects = [self._item_rects[self._items[self._drawn_index]],
+                     self._item_rects[self._items[self._selected_index]],
+                     self._cmd_rect]
+            screen.repaint(rects, self._paint)
+        else:
+            rects = []
+
+        self._drawn_index = self._selected_index
+        return rects
+
+    def invalidate(self):
+        """Force a full redraw."""
+        self._drawn_index = None
+
+    def _paint(self):
+        """Paint the whole menu."""
         selected_item = self._items[self._selected_index]
+        screen.get_surface().fill((0, 0, 0))
 
         # Draw the text
         for line, coords, item, disabled in self._buf:
             if line:
-                pygame.display.get_surface().blit(line, coords)
+                screen.get_surface().blit(line, coords)
 
             if item == selected_item and self._highlight_selection():
-                pygame.display.get_surface().blit(
+                screen.get_surface().blit(
                     self._select_marker,
                     (coords[0] + line.get_rect().w, coords[1]))
 
         # Draw the command string
         if selected_item in self._cmds:
-            pygame.display.get_surface().blit(self._cmds[selected_item],
-                                              CLIMenu._CMD_TEXT_POS)
+            screen.get_surface().blit(self._cmds[selected_item],
+                                      CLIMenu._CMD_TEXT_POS)
 
         # Draw the bezel
-        pygame.display.get_surface().blit(self._bezel, self._bezel.get_rect())
+        self._bezel.draw()
 
     @staticmethod
     def _highlight_selection():
@@ -231,10 +313,8 @@ class CLIMenu(GameState):
 
     def _hit_item(self, pos):
         """Determine whether a given point hits a menu item."""
-        # Only consider the lines associated with menu items.
-        for line, coords, item, disabled in [l for l in self._buf
-                                             if l[2] is not None]:
-            if not disabled and line.get_rect().move(coords).collidepoint(pos):
+        for rect, item in self._hit_rects:
+            if rect.collidepoint(pos):
                 return item
 
         return None
@@ -48,7 +48,10 @@ class PauseMenu(Menu):
         self._terminal.run()
         super().run(events)
 
-    def draw(self):
-        """Draw the menu."""
+    def _damage(self):
+        """Report changes to the countdown timer."""
+        return self._terminal.bezel_damage()
+
+    def _draw_background(self):
+        """Draw the terminal bezel behind the menu."""
         self._terminal.draw_bezel()
-        super().draw()
@@ -2,6 +2,8 @@
 
 import pygame
 
+import screen
+
 _HAND_STRINGS = (  # sized 24x24
   "     XX                 ",
   "    X..X                ",
@@ -63,7 +65,9 @@ class Mouse:
 
     def set_cursor(self, cursor_num):
         if self._current_cursor != cursor_num:
-            pygame.mouse.set_cursor(*Mouse._CURSORS[cursor_num])
+            # There's no cursor to change when running without a display.
+            if not screen.headless():
+                pygame.mouse.set_cursor(*Mouse._CURSORS[cursor_num])
             self._current_cursor = cursor_num
 
 
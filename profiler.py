@@ -0,0 +1,208 @@
+"""Frame profiler, with an in-game overlay."""
+
+import csv
+import time
+from collections import defaultdict, deque
+
+import pygame
+
+import constants
+import screen
+from resources import load_font
+
+
+class FrameProfiler:
+
+    """
+    Class to time each stage of a frame.
+
+    Press F3 to toggle the overlay, which shows rolling frame time statistics
+    and a breakdown of draw time by gamestate and program. Press F4 to dump
+    the last frames to a CSV file in the current directory.
+
+    """
+
+    # The overlay is timed apart from the game's drawing, so that its own
+    # cost doesn't show up in the draw times.
+    STAGES = ('events', 'run', 'draw', 'overlay', 'present')
+
+    _TOGGLE_KEY = pygame.K_F3
+    _DUMP_KEY = pygame.K_F4
+
+    _FONT_SIZE = 12
+    _COLOUR = (255, 255, 255)
+    _BACKGROUND = (0, 0, 0)
+    _PADDING = 4
+
+    # The overlay has a fixed size, so that it always covers whatever it drew
+    # on the previous frame. Long labels are clipped.
+    _RECT = pygame.Rect(556, 4, 240, 150)
+
+    # The overlay is re-rendered at most this often, in ms, so that drawing it
+    # doesn't swamp the timings it's showing.
+    _REFRESH_TIME = 250
+
+    # The number of draw labels shown in the overlay.
+    _MAX_LABELS = 5
+
+    def __init__(self, history):
+        """Initialize the class."""
+        self.overlay = False
+
+        # Each frame is stored as a tuple of (total time, stage times, number
+        # of simulation steps, draw label), with times in ms. Stages that
+        # weren't run in a frame, such as drawing on the frames that headless
+        # mode only steps, have a time of None.
+        self._frames = deque(maxlen=history)
+        self._draw_times = defaultdict(lambda: deque(maxlen=history))
+
+        self._frame_start = None
+        self._stage_times = None
+        self._steps = 0
+
+        self._overlay_surf = None
+        self._overlay_time = 0
+
+    def begin_frame(self):
+        """Start timing a new frame."""
+        self._frame_start = time.perf_counter()
+        self._stage_times = {}
+        self._steps = 0
+
+    def stage(self, name):
+        """Time a stage of the frame, for use in a with statement."""
+        return _StageTimer(self, name)
+
+    def add_step(self):
+        """Count a simulation step in the current frame."""
+        self._steps += 1
+
+    def end_frame(self, label):
+        """Finish timing a frame, where label describes what was drawn."""
+        total = (time.perf_counter() - self._frame_start) * 1000
+        stage_times = tuple(self._stage_times.get(s)
+                            for s in FrameProfiler.STAGES)
+        self._frames.append((total, stage_times, self._steps, label))
+        if 'draw' in self._stage_times:
+            self._draw_times[label].append(self._stage_times['draw'])
+
+    def handle_events(self, events):
+        """Handle the profiler keys, returning the remaining events."""
+        remaining = []
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key in (
+                    FrameProfiler._TOGGLE_KEY, FrameProfiler._DUMP_KEY):
+                if event.key == FrameProfiler._TOGGLE_KEY:
+                    self.overlay = not self.overlay
+                    self._overlay_surf = None
+                else:
+                    self.dump('profile-{}.csv'.format(
+                        time.strftime('%Y%m%d-%H%M%S')))
+            elif (event.type != pygame.KEYUP or
+                    event.key not in (FrameProfiler._TOGGLE_KEY,
+                                      FrameProfiler._DUMP_KEY)):
+                remaining.append(event)
+
+        return remaining
+
+    def percentiles(self):
+        """Get the p50, p95, p99 and max frame times, in ms."""
+        totals = sorted(f[0] for f in self._frames)
+        if not totals:
+            return 0, 0, 0, 0
+
+        def percentile(p):
+            return totals[min(len(totals) - 1, int(len(totals) * p / 100))]
+
+        return percentile(50), percentile(95), percentile(99), totals[-1]
+
+    def draw(self):
+        """
+        Draw the overlay, if it is enabled.
+
+        Returns the list of screen rects that were changed.
+
+        """
+        if not self.overlay:
+            return []
+
+        now = pygame.time.get_ticks()
+        if (self._overlay_surf is None or
+                now - self._overlay_time >= FrameProfiler._REFRESH_TIME):
+            self._overlay_surf = self._render()
+            self._overlay_time = now
+
+        # Always redraw, as the gamestate might have drawn over the overlay.
+        screen.compose(self._overlay_surf, FrameProfiler._RECT)
+        return [FrameProfiler._RECT]
+
+    def dump(self, filename):
+        """Write the recorded frames to a CSV file."""
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frame', 'total_ms') +
+                            tuple('{}_ms'.format(s)
+                                  for s in FrameProfiler.STAGES) +
+                            ('steps', 'label'))
+            for idx, (total, stage_times, steps, label) in enumerate(
+                    self._frames):
+                writer.writerow(('{}'.format(idx), '{:.3f}'.format(total)) +
+                                tuple('' if t is None else '{:.3f}'.format(t)
+                                      for t in stage_times) +
+                                (steps, label))
+
+    def _render(self):
+        """Render the overlay text."""
+        p50, p95, p99, worst = self.percentiles()
+        lines = ['frame p50 {:.1f} p95 {:.1f}'.format(p50, p95),
+                 '      p99 {:.1f} max {:.1f}'.format(p99, worst)]
+
+        # Mean time of each stage, over the frames that it was run in.
+        for idx, stage in enumerate(FrameProfiler.STAGES):
+            times = [f[1][idx] for f in self._frames if f[1][idx] is not None]
+            lines.append('{:8} {:.2f}'.format(
+                stage, sum(times) / max(1, len(times))))
+
+        # Mean draw time for the most expensive labels.
+        means = sorted(((sum(t) / len(t), label)
+                        for label, t in self._draw_times.items() if t),
+                       reverse=True)
+        lines.append('draw by state:')
+        for mean, label in means[:FrameProfiler._MAX_LABELS]:
+            lines.append(' {:.2f} {}'.format(mean, label))
+
+        font = load_font(constants.TERMINAL_FONT, FrameProfiler._FONT_SIZE)
+        surf = screen.make_surface(FrameProfiler._RECT.size)
+        surf.fill(FrameProfiler._BACKGROUND)
+
+        y_coord = FrameProfiler._PADDING
+        for line in lines:
+            surf.blit(font.render(line, True, FrameProfiler._COLOUR),
+                      (FrameProfiler._PADDING, y_coord))
+            y_coord += font.get_linesize()
+
+        return surf
+
+    def _add_time(self, name, ms):
+        """Add to the time spent in a stage of the current frame."""
+        self._stage_times[name] = self._stage_times.get(name, 0) + ms
+
+
+class _StageTimer:
+
+    """Context manager that times a single stage of a frame."""
+
+    def __init__(self, profiler, name):
+        """Initialize the class."""
+        self._profiler = profiler
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        """Start timing the stage."""
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        """Stop timing the stage, and add the time to the frame."""
+        self._profiler._add_time(self._name,
+                                 (time.perf_counter() - self._start) * 1000)
@@ -93,4 +93,5 @@ class Decrypt(program.TerminalProgram):
         else:
             self._terminal.output([self.failure_prefix +
                                    "decryption failed, reversing!"])
+            self._failed("decryption failed")
             self._terminal.freeze(Decrypt._FREEZE_TIME)
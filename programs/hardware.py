@@ -4,6 +4,7 @@ import pygame
 import random
 
 import mouse
+import screen
 from . import program
 from resources import load_image, load_font
 
@@ -192,6 +193,8 @@ class HardwareInspect(program.TerminalProgram):
     _MESSAGE_POS = (77, 572)
     _POWER_BUTTON_RECT = (49, 566, 26, 26)
 
+    _UNSAVED = ('_draw_surface', '_drawn_surface', '_board', '_message_text')
+
     """The properties of this program."""
     PROPERTIES = program.ProgramProperties(is_graphical=True,
                                            suppress_success=True,
@@ -201,37 +204,50 @@ class HardwareInspect(program.TerminalProgram):
         """Initialize the class."""
         super().__init__(terminal)
 
-        # The draw surface
+        # The draw surface, and the one on screen after the last draw.
         self._draw_surface = None
+        self._drawn_surface = None
 
         # Grab a board definition at random
-        board_def = random.choice(BoardDefinition.boards)
-
-        self._component_pairs = self._create_component_pairs(board_def)
+        self._board_def = random.choice(BoardDefinition.boards)
 
-        # Create the board
-        self._board = load_image(board_def.filename)
+        self._component_pairs = self._create_component_pairs(self._board_def)
 
-        # Add the static assets
-        for filename, pos in board_def.assets:
-            image = load_image(filename)
-            self._board.blit(image, pos)
+        # Create the board, and the message pointing at the button
+        self._board = None
+        self._message_text = None
+        self._render()
 
         # Set the board position
-        screen_rect = pygame.display.get_surface().get_rect()
+        screen_rect = screen.get_surface().get_rect()
         board_rect = self._board.get_rect()
         self._board_pos = (int((screen_rect[2] / 2) - (board_rect[2] / 2)),
                            self._BOARD_Y)
 
-        # Create the message pointing at the button
-        font = load_font(self._MESSAGE_FONT, self._MESSAGE_SIZE)
-        self._message_text = font.render(self._MESSAGE_TEXT, True,
-                                         self._MESSAGE_COLOUR)
         self._button_rect = pygame.Rect(self._POWER_BUTTON_RECT)
 
         self._completed = False
         self._exited = False
 
+    def _render(self):
+        """Render the board and the message text."""
+        self._board = load_image(self._board_def.filename)
+
+        # Add the static assets
+        for filename, pos in self._board_def.assets:
+            image = load_image(filename)
+            self._board.blit(image, pos)
+
+        font = load_font(self._MESSAGE_FONT, self._MESSAGE_SIZE)
+        self._message_text = font.render(self._MESSAGE_TEXT, True,
+                                         self._MESSAGE_COLOUR)
+
+    def _restore_drawing(self):
+        """Rebuild the board and the surfaces drawn from it."""
+        self._render()
+        self._setup_draw()
+        self._drawn_surface = None
+
     @property
     def help(self):
         """Get the help string for the program."""
@@ -286,17 +302,27 @@ class HardwareInspect(program.TerminalProgram):
                                           "Hardware error: clock skew "
                                           "detected. Recovering")
                     self._terminal.reduce_time(10)
+                    self._failed("clock skew detected")
+
+    def damage(self):
+        """Return the screen rects that will change on the next draw."""
+        if self._drawn_surface is not self._draw_surface:
+            return None
+        else:
+            return []
 
     def draw(self):
         """Draw the program."""
-        screen = pygame.display.get_surface()
-        screen.blit(self._draw_surface, self._board_pos)
+        self._drawn_surface = self._draw_surface
+
+        surface = screen.get_surface()
+        surface.blit(self._draw_surface, self._board_pos)
 
         # Draw the power off bezel now, so we can then write on it.
         self._terminal.draw_bezel(power_off=True)
 
         # Draw message text
-        screen.blit(self._message_text, self._MESSAGE_POS)
+        screen.compose(self._message_text, self._MESSAGE_POS)
 
     def _create_component_pairs(self, board_def):
         component_pairs = []
@@ -353,6 +379,13 @@ class Component:
         self._image = None
         self._pos = pos
 
+    def __getstate__(self):
+        """Get the state to save in a snapshot."""
+        # The image is created again when it's next drawn.
+        state = self.__dict__.copy()
+        state['_image'] = None
+        return state
+
     def toggle(self):
         self.disabled = not self.disabled
 
@@ -368,8 +401,7 @@ class Component:
         if self.disabled:
             image = self._image.copy()
             rect = self._image.get_rect()
-            dark = pygame.Surface((rect[2], rect[3]),
-                                  flags=pygame.SRCALPHA)
+            dark = screen.make_surface((rect[2], rect[3]), alpha=True)
             dark.fill((100, 100, 100, 0))
             image.blit(dark, (0, 0), special_flags=pygame.BLEND_RGBA_SUB)
             surface.blit(image, self._pos)
@@ -405,7 +437,7 @@ class Resistor(Component):
         # resistor and have it ignore the portions of the lines outside the
         # resistor
         height = self._image.get_rect()[3]
-        surface = pygame.Surface((self._AREA_WIDTH, height))
+        surface = screen.make_surface((self._AREA_WIDTH, height))
         surface.fill((255, 255, 255))
         surface.set_alpha(0)
 
@@ -4,6 +4,7 @@ import logging
 import random
 from enum import Enum, unique
 from copy import deepcopy
+from completion import Trie
 from . import program
 
 
@@ -28,6 +29,9 @@ class HexEditor(program.TerminalProgram):
     # How long is the freeze time (in ms) when a mistake is made
     _FREEZE_TIME = 5 * 1000
 
+    # The answers to the row prompt, for tab completion.
+    _ROW_ANSWERS = Trie(['yes', 'no'])
+
     """The properties of this program."""
     PROPERTIES = program.ProgramProperties(alternate_buf=True)
 
@@ -41,6 +45,12 @@ class HexEditor(program.TerminalProgram):
         self._start_data = []
         self._end_data = []
 
+        # Incremented whenever the data changes.
+        self._version = 0
+
+        # The column numbers, for tab completion.
+        self._columns = None
+
     @property
     def help(self):
         """Return the help string."""
@@ -62,6 +72,15 @@ class HexEditor(program.TerminalProgram):
             return HexEditor._VAL_PROMPT.format(
                 self._start_data[self._row][self._col])
 
+    @property
+    def completions(self):
+        """Return the answers to the current prompt, for tab completion."""
+        if self._state == HexEditor.States.QUERY_ROW:
+            return HexEditor._ROW_ANSWERS
+        elif self._state == HexEditor.States.ENTER_COL:
+            return self._columns
+        return None
+
     def start(self):
         """Start the program."""
         self._row = 0
@@ -69,6 +88,8 @@ class HexEditor(program.TerminalProgram):
         self._state = HexEditor.States.QUERY_ROW
         self._start_data = HexEditor._generate_data()
         self._end_data = deepcopy(self._start_data)
+        self._version += 1
+        self._columns = Trie(str(i) for i in range(len(self._start_data[0])))
 
     def completed(self):
         """Indicate whether the user has guessed the password."""
@@ -112,6 +133,7 @@ class HexEditor(program.TerminalProgram):
 
                 self._row += 1
                 self._state = HexEditor.States.QUERY_ROW
+                self._version += 1
 
         # Check if we've reached the end of the file, and if so see if the edits
         # were correct.
@@ -127,6 +149,7 @@ class HexEditor(program.TerminalProgram):
                 self._terminal.output([self.failure_prefix +
                                        "corruption detected "
                                        "in system file, repairing!"])
+                self._failed("corruption detected")
                 self._terminal.freeze(HexEditor._FREEZE_TIME)
 
     @staticmethod
@@ -151,6 +174,11 @@ class HexEditor(program.TerminalProgram):
 
         return reversed(lines)
 
+    @property
+    def buf_version(self):
+        """Return a value that changes whenever the buf contents change."""
+        return self._version
+
     def _data_correct(self):
         """Determine if the edits made to the data were correct."""
         edited_previous = False
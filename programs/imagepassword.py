@@ -3,6 +3,7 @@
 import pygame
 import random
 import mouse
+import screen
 from enum import Enum, unique
 from . import program
 from resources import load_font, load_image
@@ -87,6 +88,12 @@ class ImagePassword(program.TerminalProgram):
 
     _LOCK_TIME = 2000
 
+    # The surfaces that are the same for every instance, which are rendered
+    # the first time they're needed.
+    _surfaces = None
+
+    _UNSAVED = ('_background', '_correct_overlay', '_flash', '_drawn')
+
     """The properties of this program."""
     PROPERTIES = program.ProgramProperties(is_graphical=True)
 
@@ -97,17 +104,32 @@ class ImagePassword(program.TerminalProgram):
         self._user_info = random.choice(ImagePassword._USER_INFO)
         self._buttons = []
         self._lock_time = 0
-        self._background = pygame.Surface(ImagePassword._BACKGROUND_SIZE)
-        self._background.fill(ImagePassword._BACKGROUND_COLOUR)
-        header = pygame.Surface(ImagePassword._HEADER_SIZE)
+        self._restore_drawing()
+
+    def _restore_drawing(self):
+        """Get the shared surfaces, and forget what's on screen."""
+        if ImagePassword._surfaces is None:
+            ImagePassword._surfaces = ImagePassword._render_surfaces()
+        self._background, self._correct_overlay, self._flash = (
+            ImagePassword._surfaces)
+
+        # What was on screen after the last draw.
+        self._drawn = None
+
+    @staticmethod
+    def _render_surfaces():
+        """Render the background, guessed overlay and flash surfaces."""
+        background = screen.make_surface(ImagePassword._BACKGROUND_SIZE)
+        background.fill(ImagePassword._BACKGROUND_COLOUR)
+        header = screen.make_surface(ImagePassword._HEADER_SIZE)
         header.fill(ImagePassword._HEADER_COLOUR)
-        self._background.blit(header, ImagePassword._HEADER_POS)
+        background.blit(header, ImagePassword._HEADER_POS)
 
         font = load_font(ImagePassword._HEADER_TEXT_FONT,
                          ImagePassword._HEADER_TEXT_SIZE)
         text = font.render("Select three images", True,
                            ImagePassword._HEADER_TEXT_COLOUR)
-        self._background.blit(text, ImagePassword._HEADER_TEXT_POS)
+        background.blit(text, ImagePassword._HEADER_TEXT_POS)
 
         for coords in ImagePassword._BUTTON_COORDS:
             border_coords = (coords[0] - ImagePassword._BUTTON_BORDER_WIDTH -
@@ -117,17 +139,20 @@ class ImagePassword(program.TerminalProgram):
             border_size = (ImagePassword._BUTTON_SIZE +
                            ImagePassword._BUTTON_BORDER_WIDTH * 2)
 
-            border = pygame.Surface((border_size, border_size))
+            border = screen.make_surface((border_size, border_size))
             border.fill(ImagePassword._BUTTON_BORDER_COLOUR)
-            self._background.blit(border, border_coords)
+            background.blit(border, border_coords)
+
+        correct_overlay = screen.make_surface(
+            (ImagePassword._BUTTON_SIZE, ImagePassword._BUTTON_SIZE))
+        correct_overlay.fill(ImagePassword._GUESSED_OVERLAY_COLOUR)
+        correct_overlay.set_alpha(ImagePassword._GUESSED_OVERLAY_ALPHA,
+                                  pygame.RLEACCEL)
 
-        self._correct_overlay = pygame.Surface((ImagePassword._BUTTON_SIZE,
-                                                ImagePassword._BUTTON_SIZE))
-        self._correct_overlay.fill(ImagePassword._GUESSED_OVERLAY_COLOUR)
-        self._correct_overlay.set_alpha(ImagePassword._GUESSED_OVERLAY_ALPHA)
+        flash = screen.make_surface(ImagePassword._BACKGROUND_SIZE)
+        flash.fill(ImagePassword._BACKGROUND_FLASH_COLOUR)
 
-        self._flash = pygame.Surface(ImagePassword._BACKGROUND_SIZE)
-        self._flash.fill(ImagePassword._BACKGROUND_FLASH_COLOUR)
+        return background, correct_overlay, flash
 
     @property
     def help(self):
@@ -172,26 +197,47 @@ class ImagePassword(program.TerminalProgram):
                 self._terminal.time <= self._lock_time +
                 ImagePassword._LOCK_TIME)
 
+    def _draw_state(self):
+        """Get the state that determines what the program looks like."""
+        return (self._locked(), self._flashing(),
+                [(surf, correct) for surf, _, _, correct in self._buttons])
+
+    def _flashing(self):
+        """Indicate if the background is flashing after a mistake."""
+        return (self._lock_time != 0 and self._terminal.time <=
+                self._lock_time + ImagePassword._BACKGROUND_FLASH_TIME)
+
+    def damage(self):
+        """Return the screen rects that will change on the next draw."""
+        if self._drawn is None:
+            return None
+        elif self._drawn != self._draw_state():
+            # Everything happens within the background.
+            return [pygame.Rect(ImagePassword._BACKGROUND_POS,
+                                ImagePassword._BACKGROUND_SIZE)]
+        else:
+            return []
+
     def draw(self):
         """Draw the program."""
+        self._drawn = self._draw_state()
+
         # Draw the background.
-        pygame.display.get_surface().blit(self._background,
-                                          ImagePassword._BACKGROUND_POS)
+        screen.get_surface().blit(self._background,
+                                  ImagePassword._BACKGROUND_POS)
 
         # If the user has made a mistake, flash the background.
-        if (self._lock_time != 0 and self._terminal.time <= self._lock_time +
-                ImagePassword._BACKGROUND_FLASH_TIME):
-            pygame.display.get_surface().blit(self._flash,
-                                              ImagePassword._BACKGROUND_POS)
+        if self._flashing():
+            screen.get_surface().blit(self._flash,
+                                      ImagePassword._BACKGROUND_POS)
 
         # Draw the buttons.
         if not self._locked():
             for surf, coords, _, correct in self._buttons:
-                pygame.display.get_surface().blit(surf, coords)
+                screen.get_surface().blit(surf, coords)
 
                 if correct:
-                    pygame.display.get_surface().blit(self._correct_overlay,
-                                                      coords)
+                    screen.get_surface().blit(self._correct_overlay, coords)
 
     def on_mouseclick(self, button, pos):
         """Detect whether the user clicked the correct image."""
@@ -214,6 +260,7 @@ class ImagePassword(program.TerminalProgram):
                     else:
                         self._lock_time = self._terminal.time
                         self._pick_images()
+                        self._failed("incorrect images")
 
     def completed(self):
         """Indicate whether the program was successfully completed."""
@@ -1,10 +1,12 @@
 
+import functools
 import itertools
 import pygame
 import random
 from enum import Enum, unique
 
 import mouse
+import screen
 from . import program
 from resources import load_font
 
@@ -25,6 +27,8 @@ class MineHunt(program.TerminalProgram):
     _TIMER_FONT_SIZE = 30
     _FONT = 'media/fonts/Sansation_Regular.ttf'
 
+    _UNSAVED = ('_drawn', '_game_over_texts', '_game_won_texts')
+
     def __init__(self, terminal):
         """Initialize the class."""
         super().__init__(terminal)
@@ -38,12 +42,23 @@ class MineHunt(program.TerminalProgram):
         self._start_time = None
         self._time_secs = None
 
-        screen_rect = pygame.display.get_surface().get_rect()
+        screen_rect = screen.get_surface().get_rect()
         self._board_pos = (int((screen_rect[2] / 2) - (self._board.width / 2)),
                            self._BOARD_Y)
 
         self._status_font = load_font(self._FONT, self._STATUS_FONT_SIZE)
         self._timer_font = load_font(self._FONT, self._TIMER_FONT_SIZE)
+
+        # The area covered by the timer text, and what was on screen when the
+        # program was last drawn.
+        self._timer_rect = pygame.Rect(self._board_pos[0], self._TIMER_Y,
+                                       self._board.width,
+                                       self._timer_font.get_linesize())
+        self._restore_drawing()
+
+    def _restore_drawing(self):
+        """Render the end of game text, and forget what's on screen."""
+        self._drawn = None
         end_font = load_font(self._FONT, self._END_FONT_SIZE)
         self._game_over_texts = [
             end_font.render("Game over!!", True, (255, 255, 255)),
@@ -100,7 +115,10 @@ class MineHunt(program.TerminalProgram):
     def on_mouseclick(self, button, pos):
         """Detect whether the user clicked the program."""
         board_pos = (pos[0] - self._board_pos[0], pos[1] - self._board_pos[1])
+        was_playing = self._board.state == Board.State.PLAYING
         self._board.on_mouseclick(button, board_pos)
+        if was_playing and self._board.state == Board.State.MINE_HIT:
+            self._failed("mine hit")
 
         # Have we reached the program complete condition?
         self._check_completed()
@@ -111,30 +129,45 @@ class MineHunt(program.TerminalProgram):
             time_passed = self._terminal.time - self._start_time
             self._time_secs = int(time_passed / 1000)
 
+    def damage(self):
+        """Return the screen rects that will change on the next draw."""
+        if self._drawn is None or self._drawn[:2] != self._draw_state()[:2]:
+            return None
+        elif self._drawn != self._draw_state():
+            return [self._timer_rect]
+        else:
+            return []
+
+    def _draw_state(self):
+        """Get the state that determines what the program looks like."""
+        return self._board.draw_surface, self._board.state, self._time_secs
+
     def draw(self):
         """Draw the program."""
-        screen = pygame.display.get_surface()
-        screen.blit(self._board.draw_surface,
+        self._drawn = self._draw_state()
+
+        surface = screen.get_surface()
+        surface.blit(self._board.draw_surface,
                     self._board_pos)
-        screen_rect = screen.get_rect()
+        screen_rect = surface.get_rect()
 
         # Draw timer
         text = self._timer_font.render("Time: {}"
                                        .format(self._time_secs),
                                        True, (255, 255, 255))
-        screen.blit(text, (self._board_pos[0], self._TIMER_Y))
+        surface.blit(text, (self._board_pos[0], self._TIMER_Y))
 
         # Have we hit a mine? Draw game over text
         # TODO: have a game surface and draw this on
         if self._board.state != Board.State.PLAYING:
             # Dim the board
-            dim = pygame.Surface((self._board.width, self._board.height),
-                                 flags=pygame.SRCALPHA)
+            dim = screen.make_surface((self._board.width, self._board.height),
+                                      alpha=True)
             if self._board.state == Board.State.CLEARED:
                 dim.fill((255, 100, 255, 0))
             else:
                 dim.fill((100, 255, 255, 0))
-            screen.blit(dim, self._board_pos,
+            surface.blit(dim, self._board_pos,
                         special_flags=pygame.BLEND_RGBA_SUB)
 
             # Get the end game texts
@@ -147,7 +180,7 @@ class MineHunt(program.TerminalProgram):
             for text in texts:
                 text_rect = text.get_rect()
                 text_x = int(screen_rect[2] / 2 - text_rect[2] / 2)
-                screen.blit(text, (text_x, text_y))
+                surface.blit(text, (text_x, text_y))
 
                 text_y += text_rect[3]
 
@@ -159,7 +192,7 @@ class MineHunt(program.TerminalProgram):
                                             True, (255, 255, 255))
             text_x = int(screen_rect[2] / 2 - text.get_rect()[2] / 2)
             text_y = self._board_pos[1] + self._board.height + 5
-            screen.blit(text, (text_x, text_y))
+            surface.blit(text, (text_x, text_y))
 
     def _check_completed(self):
         # Did the user click with the correct time remaining?
@@ -238,8 +271,23 @@ class Board:
         self.width = self._cols * self._square_size
         self.height = self._rows * self._square_size
 
-        # Create the board
-        self._surface = pygame.Surface((self.width, self.height))
+        self._render()
+
+    def __getstate__(self):
+        """Get the state to save in a snapshot."""
+        state = self.__dict__.copy()
+        del state['_surface']
+        del state['draw_surface']
+        return state
+
+    def __setstate__(self, state):
+        """Restore the board from a snapshot."""
+        self.__dict__.update(state)
+        self._render()
+
+    def _render(self):
+        """Create the board, and draw the squares on it."""
+        self._surface = screen.make_surface((self.width, self.height))
         self._surface.fill((255, 255, 255))
 
         self._setup_draw()
@@ -406,48 +454,62 @@ class Square:
         # Count of neighbours who are mines
         self.mines_nearby = 0
 
-        # Create our surfaces
-        self._surfaces = {
-            Square.State.HIDDEN: pygame.Surface(self.rect[2:]),
-            Square.State.FLAGGED: pygame.Surface(self.rect[2:]),
-            Square.State.REVEALED: pygame.Surface(self.rect[2:]),
-        }
-
-        self._surfaces[Square.State.HIDDEN].fill((180, 180, 180))
-        self._surfaces[Square.State.FLAGGED].fill((180, 180, 180))
-        self._surfaces[Square.State.REVEALED].fill((255, 255, 255))
-
-        for surface in self._surfaces.values():
-            pygame.draw.rect(surface, (0, 0, 0),
-                             (0, 0, self.rect[2], self.rect[3]), 1)
-
-        # If we are a mine, then add mine to revealed square
-        if self.type == Square.Type.MINE:
-            center = (int(self.rect[2] / 2), int(self.rect[3] / 2))
-            pygame.draw.circle(self._surfaces[Square.State.REVEALED],
-                               (0, 0, 0),
-                               center,
-                               int(self._MINE_SCALE_FACTOR * center[0]),
-                               0)
-
-        # Add a flag to the flagged square
-        flag = self._surfaces[Square.State.FLAGGED]
-        pole_length = int(self.rect[3] * self._FLAG_HEIGHT_FACTOR)
-        flag_size = int(pole_length * self._FLAG_SIZE_FACTOR)
-        pole_gap = int((self.rect[3] - pole_length) / 2)
-        x_coord = int(self.rect[2] / 2 - flag_size / 2 +
-                      self._FLAG_POLE_WIDTH / 2)
-        pygame.draw.line(flag, (0, 0, 0),
-                         (x_coord, pole_gap),
-                         (x_coord, self.rect[3] - pole_gap),
-                         self._FLAG_POLE_WIDTH)
-        pygame.draw.rect(flag, (255, 20, 20),
-                         ((x_coord, pole_gap,
-                           flag_size, int(flag_size * 0.9))),
-                         0)
-
     def get_surface(self):
-        return self._surfaces[self.state]
+        return Square._render(tuple(self.rect[2:]), self.type, self.state,
+                              self.mines_nearby)
+
+    # Squares that look the same share a surface, so a board only renders
+    # each kind of square once, and boards of the same size share them all.
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _render(size, square_type, state, mines_nearby):
+        """Render a square of a given size, type and state."""
+        width, height = size
+        surface = screen.make_surface(size)
+        if state == Square.State.REVEALED:
+            surface.fill((255, 255, 255))
+        else:
+            surface.fill((180, 180, 180))
+        pygame.draw.rect(surface, (0, 0, 0), (0, 0, width, height), 1)
+
+        if state == Square.State.REVEALED:
+            # If we are a mine, then add mine to revealed square
+            if square_type == Square.Type.MINE:
+                center = (int(width / 2), int(height / 2))
+                pygame.draw.circle(surface,
+                                   (0, 0, 0),
+                                   center,
+                                   int(Square._MINE_SCALE_FACTOR * center[0]),
+                                   0)
+
+            # Draw the number on our revealed surface
+            if mines_nearby > 0:
+                font = load_font(Square._FONT,
+                                 int(width * Square._FONT_SCALE))
+                text = font.render(str(mines_nearby), True, (0, 0, 0))
+
+                surface_rect = surface.get_rect()
+                text_rect = text.get_rect()
+                surface.blit(text,
+                             (int(surface_rect[2] / 2 - text_rect[2] / 2),
+                              int(surface_rect[3] / 2 - text_rect[3] / 2)))
+        elif state == Square.State.FLAGGED:
+            # Add a flag to the flagged square
+            pole_length = int(height * Square._FLAG_HEIGHT_FACTOR)
+            flag_size = int(pole_length * Square._FLAG_SIZE_FACTOR)
+            pole_gap = int((height - pole_length) / 2)
+            x_coord = int(width / 2 - flag_size / 2 +
+                          Square._FLAG_POLE_WIDTH / 2)
+            pygame.draw.line(surface, (0, 0, 0),
+                             (x_coord, pole_gap),
+                             (x_coord, height - pole_gap),
+                             Square._FLAG_POLE_WIDTH)
+            pygame.draw.rect(surface, (255, 20, 20),
+                             ((x_coord, pole_gap,
+                               flag_size, int(flag_size * 0.9))),
+                             0)
+
+        return surface
 
     def collidepoint(self, board_pos):
         return pygame.Rect(self.rect).collidepoint(board_pos)
@@ -459,18 +521,6 @@ class Square:
         self.mines_nearby = len([n for n in neighbours
                                  if n.type == Square.Type.MINE])
 
-        # Draw the number on our revealed surface
-        if self.mines_nearby > 0:
-            font = load_font(self._FONT, int(self.rect[2] * self._FONT_SCALE))
-            text = font.render(str(self.mines_nearby), True, (0, 0, 0))
-
-            surface = self._surfaces[Square.State.REVEALED]
-            surface_rect = surface.get_rect()
-            text_rect = text.get_rect()
-            surface.blit(text,
-                         (int(surface_rect[2] / 2 - text_rect[2] / 2),
-                          int(surface_rect[3] / 2 - text_rect[3] / 2)))
-
 
 class Puzzle:
     puzzles = []
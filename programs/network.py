@@ -139,6 +139,9 @@ class NetworkManager(program.TerminalProgram):
         # Reason for being in error mode
         self._error_msg = None
 
+        # Incremented whenever the map or error state changes.
+        self._version = 0
+
         # Parser the puzzle and solution
         self._puzzle = PuzzleParser(puzzle[0])
 
@@ -175,31 +178,7 @@ class NetworkManager(program.TerminalProgram):
                  "Network map:",
                  ""]
 
-        # If error mode, start reversing the path
-        if self._error_mode:
-            if self._last_revert_time is None:
-                last_time, delay = self._error_mode_start, \
-                                   self._ERROR_INITIAL_WAIT
-            else:
-                last_time, delay = self._last_revert_time, \
-                                   self._REVERT_LINK_TIME
-            if last_time + delay < self._terminal.time:
-                # Find where we came from
-                from_node = self._visited_from[self._curr]
-
-                # Remove link
-                del self._visited_from[self._curr]
-
-                # Update position. If we have reached None, then start again
-                if from_node is None:
-                    self.start()
-                else:
-                    self._curr = from_node
-                    self._last_revert_time = self._terminal.time
-
-        is_on = (self._error_mode or
-                 self._terminal.time % (self._ON_MS + self._OFF_MS) <
-                 self._ON_MS)
+        is_on = self._blink_on()
 
         # Draw the grid
         for r in range(self._puzzle.rows):
@@ -253,6 +232,38 @@ class NetworkManager(program.TerminalProgram):
 
         return reversed(lines)
 
+    @property
+    def buf_version(self):
+        """Return a value that changes whenever the buf contents change."""
+        # The current node flashes, so the buf also changes with the phase.
+        return self._version, self._blink_on()
+
+    def run(self):
+        """Revert the path one link at a time while in error mode."""
+        if not self._error_mode:
+            return
+
+        if self._last_revert_time is None:
+            last_time, delay = self._error_mode_start, \
+                               self._ERROR_INITIAL_WAIT
+        else:
+            last_time, delay = self._last_revert_time, \
+                               self._REVERT_LINK_TIME
+        if last_time + delay < self._terminal.time:
+            # Find where we came from
+            from_node = self._visited_from[self._curr]
+
+            # Remove link
+            del self._visited_from[self._curr]
+
+            # Update position. If we have reached None, then start again
+            if from_node is None:
+                self.start()
+            else:
+                self._curr = from_node
+                self._last_revert_time = self._terminal.time
+                self._version += 1
+
     def start(self):
         # Reset board
         self._visited_from = {}
@@ -265,6 +276,7 @@ class NetworkManager(program.TerminalProgram):
         # Make sure error mode is turned off
         self._error_mode = False
         self._last_revert_time = None
+        self._version += 1
 
     def completed(self):
         """Indicate whether the program was completed."""
@@ -297,6 +309,7 @@ class NetworkManager(program.TerminalProgram):
                 new_curr not in self._visited_from):
             self._visited_from[new_curr] = self._curr
             self._curr = new_curr
+            self._version += 1
 
             # Was this a valid node?
             if new_curr in self._puzzle.bad_nodes:
@@ -322,7 +335,15 @@ class NetworkManager(program.TerminalProgram):
     def _enable_error_mode(self, msg):
         self._error_mode = True
         self._error_msg = msg
+        self._failed(msg)
         self._error_mode_start = self._terminal.time
+        self._version += 1
+
+    def _blink_on(self):
+        """Indicate whether the current node is showing, as it flashes."""
+        return (self._error_mode or
+                self._terminal.time % (self._ON_MS + self._OFF_MS) <
+                self._ON_MS)
 
 
 class PuzzleParser:
@@ -81,6 +81,7 @@ class PasswordGuess(program.TerminalProgram):
             if self._guesses == PasswordGuess._MAX_GUESSES:
                 self._terminal.output([
                     'Max retries reached - password reset!'])
+                self._failed("max retries reached")
             else:
                 self._terminal.output([
                     'Incorrect password. {} of {} characters correct'.format(
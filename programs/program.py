@@ -1,5 +1,7 @@
 """Base class definitions for use by programs."""
 
+from events import GameEvent
+
 
 class BadInput(Exception):
 
@@ -43,10 +45,36 @@ class TerminalProgram:
 
     SUCCESS_PREFIX = "SYSTEM INFO:"
 
+    # Attributes that are only used for drawing, so are left out of snapshots
+    # and rebuilt by _restore_drawing() when the program is restored.
+    _UNSAVED = ()
+
     def __init__(self, terminal):
         """Initialize the class."""
         self._terminal = terminal
 
+    def __getstate__(self):
+        """Get the state to save in a snapshot."""
+        # The terminal saves itself, and reattaches its programs on restore.
+        state = self.__dict__.copy()
+        for name in ('_terminal',) + self._UNSAVED:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        """Restore the program from a snapshot."""
+        self.__dict__.update(state)
+        self._terminal = None
+        self._restore_drawing()
+
+    def attach(self, terminal):
+        """Attach a program restored from a snapshot to its terminal."""
+        self._terminal = terminal
+
+    def _restore_drawing(self):
+        """Rebuild the attributes that were left out of a snapshot."""
+        pass
+
     @property
     def allow_ctrl_c(self):
         """Indicate whether ctrl-c is allowed to cancel the program."""
@@ -62,6 +90,26 @@ class TerminalProgram:
         """Return help string for this program."""
         return "<empty>"
 
+    @property
+    def subcommands(self):
+        """
+        Return Commands that can follow the program's name at the prompt.
+
+        These let a program be used without starting it, e.g. 'prog status'.
+
+        """
+        return []
+
+    @property
+    def completions(self):
+        """
+        Return a Trie of what the user could be typing, for tab completion.
+
+        None if the program doesn't offer completions for its current input.
+
+        """
+        return None
+
     @property
     def security_type(self):
         """Return string indicating what security this program can bypass."""
@@ -80,10 +128,32 @@ class TerminalProgram:
         """Terminal buffer contents for this interactive program."""
         return []
 
+    @property
+    def buf_version(self):
+        """
+        Return a value that changes whenever the buf contents change.
+
+        The terminal only reads buf again when this changes. Returns None if
+        the program doesn't track its changes, in which case buf is read on
+        every draw.
+
+        """
+        return None
+
     def draw(self):
         """Draw the program, if it is graphical."""
         pass
 
+    def damage(self):
+        """
+        Return the screen rects that will change on the next draw.
+
+        Returns None if the whole screen needs to be redrawn, which is the
+        default for graphical programs that don't track their own changes.
+
+        """
+        return None
+
     def run(self):
         """Run any background program logic that isn't user input driven."""
         pass
@@ -105,6 +175,10 @@ class TerminalProgram:
         """Handle a user keypress (used for INTERACTIVE and GRAPHICAL)."""
         pass
 
+    def _failed(self, reason):
+        """Let anything listening know the player got the program wrong."""
+        self._terminal.events.publish(GameEvent.PROGRAM_FAILED, self, reason)
+
     def on_mouseclick(self, button, pos):
         """Handle a mouse click from the user."""
         pass
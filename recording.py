@@ -0,0 +1,120 @@
+"""Recording and replaying of game sessions."""
+
+import gzip
+import json
+
+import pygame
+
+# The version of the recording format.
+_VERSION = 1
+
+# The event attributes that are recorded. Anything else on an event, such as
+# the window it came from, is specific to the session that produced it.
+_EVENT_ATTRS = ('key', 'unicode', 'mod', 'button', 'pos', 'rel', 'buttons',
+                'state', 'gain')
+
+
+class RecordingError(Exception):
+
+    """Exception raised for a recording that can't be replayed."""
+
+    pass
+
+
+class Recorder:
+
+    """
+    Class to record a game session to a file.
+
+    The file is gzipped JSON, with one line per frame after a header line.
+    Each frame records the real time at which it started, and the events fed
+    into every simulation step run in that frame. Together with the random
+    seed, the fixed step length and the number of sessions the input was
+    shared between, that is enough to reproduce the session exactly,
+    including the hitches.
+
+    """
+
+    def __init__(self, filename, seed, step_ms, sessions=1):
+        """Initialize the class."""
+        self._file = gzip.open(filename, 'wt')
+        self._write({'version': _VERSION, 'seed': seed, 'step_ms': step_ms,
+                     'sessions': sessions})
+        self._start = pygame.time.get_ticks()
+        self._frame_time = 0
+        self._steps = []
+
+    def begin_frame(self):
+        """Start recording a new frame."""
+        self._frame_time = pygame.time.get_ticks() - self._start
+        self._steps = []
+
+    def step(self, events):
+        """Record the events fed into a single simulation step."""
+        self._steps.append([_encode_event(e) for e in events])
+
+    def end_frame(self):
+        """Finish recording a frame."""
+        self._write({'time': self._frame_time, 'steps': self._steps})
+        self._steps = []
+
+    def close(self):
+        """Finish the recording."""
+        self._file.close()
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, separators=(',', ':')) + '\n')
+
+
+class Replay:
+
+    """Class to read back a recorded game session."""
+
+    def __init__(self, filename, step_ms, sessions=1):
+        """Initialize the class."""
+        self._file = gzip.open(filename, 'rt')
+        header = json.loads(self._file.readline())
+        if header.get('version') != _VERSION:
+            raise RecordingError('Unsupported recording version: {}'.format(
+                header.get('version')))
+        if header['step_ms'] != step_ms:
+            raise RecordingError('Recording uses a step of {}ms, not {}ms'
+                                 .format(header['step_ms'], step_ms))
+
+        # Recordings from before there could be several sessions have one.
+        if header.get('sessions', 1) != sessions:
+            raise RecordingError('Recording has {} sessions, not {}'.format(
+                header.get('sessions', 1), sessions))
+
+        self.seed = header['seed']
+
+    def frames(self):
+        """
+        Generate the recorded frames.
+
+        Each frame is a tuple of the time it started, in ms since the start of
+        the session, and a list of the events for each step in the frame.
+
+        """
+        with self._file:
+            for line in self._file:
+                frame = json.loads(line)
+                yield frame['time'], [[_decode_event(e) for e in events]
+                                      for events in frame['steps']]
+
+
+def _encode_event(event):
+    """Convert an event to a JSON-compatible list."""
+    return [event.type, {a: getattr(event, a) for a in _EVENT_ATTRS
+                         if hasattr(event, a)}]
+
+
+def _decode_event(encoded):
+    """Convert an event from its JSON-compatible list."""
+    event_type, attrs = encoded
+
+    # JSON doesn't have tuples, but positions and button states need to be
+    # tuples.
+    return pygame.event.Event(event_type,
+                              {a: tuple(v) if isinstance(v, list) else v
+                               for a, v in attrs.items()})
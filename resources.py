@@ -7,6 +7,9 @@ import pygame
 # A dict mapping filenames to the in-memory representation for each asset.
 _media = {}
 
+# A dict mapping the id of each asset to its key in _media.
+_keys = {}
+
 
 def make_path(filename):
     """Create the correct path for a given file."""
@@ -21,13 +24,35 @@ def make_path(filename):
 def load_font(filename, size):
     """Load a font from disk, return a pygame Font object."""
     if (filename, size) not in _media:
-        _media[(filename, size)] = pygame.font.Font(make_path(filename), size)
+        _add((filename, size), pygame.font.Font(make_path(filename), size))
     return _media[(filename, size)]
 
 
 def load_image(filename):
     """Load an image from disk, return a pygame Surface."""
     if filename not in _media:
-        _media[filename] = pygame.image.load(
-            make_path(filename)).convert_alpha()
+        _add(filename, pygame.image.load(make_path(filename)).convert_alpha())
     return _media[filename]
+
+
+def media_key(asset):
+    """
+    Get the key that a loaded asset can be loaded again by, or None.
+
+    Fonts are keyed by a (filename, size) tuple, and images by filename.
+
+    """
+    return _keys.get(id(asset))
+
+
+def load_media(key):
+    """Load an asset by the key that media_key() returned for it."""
+    if isinstance(key, tuple):
+        return load_font(*key)
+    return load_image(key)
+
+
+def _add(key, asset):
+    """Store a newly loaded asset."""
+    _media[key] = asset
+    _keys[id(asset)] = key
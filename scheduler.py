@@ -0,0 +1,93 @@
+"""Frame scheduling - decide how often the game loop should run."""
+
+import pygame
+
+import util
+
+
+class FrameScheduler:
+
+    """
+    Class to throttle the game loop.
+
+    The loop runs at the target rate while the player is interacting with the
+    game, drops to the idle rate once input has stopped and the current
+    gamestate has no time-critical work, and to the background rate while the
+    window doesn't have input focus. Input wakes the loop from the idle and
+    background rates, but the loop never runs faster than the target rate, so
+    continuous input such as mouse motion is gathered into frames rather than
+    each event getting a frame of its own.
+
+    """
+
+    # How long after the last input before the idle rate kicks in, in ms.
+    _IDLE_DELAY = 2000
+
+    # Event types that count as player input. Button releases aren't
+    # included, as the input filter doesn't queue them.
+    _INPUT_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN,
+                     pygame.MOUSEMOTION)
+
+    def __init__(self, target_fps, idle_fps, background_fps):
+        """Initialize the class."""
+        self._target_fps = target_fps
+        self._idle_fps = idle_fps
+        self._background_fps = background_fps
+
+        self._has_focus = True
+        self._last_input = pygame.time.get_ticks()
+        self._last_frame = self._last_input
+
+    @property
+    def fps(self):
+        """The rate the loop should currently run at."""
+        if not self._has_focus:
+            return self._background_fps
+        elif pygame.time.get_ticks() - self._last_input >= self._IDLE_DELAY:
+            return self._idle_fps
+        else:
+            return self._target_fps
+
+    def next_frame(self, busy=False):
+        """
+        Wait until the next frame is due, and return the pending events.
+
+        If busy is set, the caller has time-critical work in progress and the
+        idle rate is not used.
+
+        """
+        fps = self._target_fps if busy and self._has_focus else self.fps
+        deadline = self._last_frame + 1000 // fps
+
+        target_deadline = self._last_frame + 1000 // self._target_fps
+
+        events = []
+        timeout = deadline - pygame.time.get_ticks()
+        if timeout > 0 and deadline > target_deadline:
+            # Sleep until the frame is due, but wake as soon as an event
+            # arrives, so that input isn't left waiting for a slow frame.
+            event = pygame.event.wait(timeout)
+            if event.type != pygame.NOEVENT:
+                events.append(event)
+
+        # Whatever woke the loop, wait out the rest of a frame at the target
+        # rate, handling the events from all of it together.
+        timeout = target_deadline - pygame.time.get_ticks()
+        if timeout > 0:
+            pygame.time.wait(timeout)
+        events.extend(pygame.event.get())
+
+        self._last_frame = pygame.time.get_ticks()
+        self._on_events(events)
+
+        return events
+
+    def _on_events(self, events):
+        """Track input and focus changes."""
+        for event in events:
+            if event.type in FrameScheduler._INPUT_EVENTS:
+                self._last_input = self._last_frame
+            elif event.type == pygame.ACTIVEEVENT:
+                active_event = util.ActiveEvent(event.state, event.gain)
+                if active_event.input_focus_change:
+                    self._has_focus = active_event.gained
@@ -0,0 +1,527 @@
+"""Screen presentation - get drawn frames onto the display."""
+
+import contextlib
+import math
+import os
+import weakref
+
+import pygame
+
+# The bit depth of the display. Surfaces in a 32-bit format have one pixel per
+# aligned word, so blitting between them is much faster than with 24 bits.
+_DEPTH = 32
+
+# If the damaged area covers more than this fraction of the screen, it is
+# cheaper to flip the whole display than to update each rect.
+_FULL_UPDATE_FRACTION = 0.6
+
+# The logical surface that gamestates draw to. This always has the game's
+# fixed resolution, whatever the size of the window.
+_surface = None
+
+# The surface that get_surface() returns. This is the logical surface, except
+# while drawing to part of it, e.g. a session's viewport.
+_target = None
+
+# The display surface, or None when running without a display or when using
+# the renderer.
+_window = None
+
+# When using the renderer, pygame's video module, the window it draws to, the
+# renderer itself, and the texture holding a copy of the logical surface.
+_video = None
+_render_window = None
+_renderer = None
+_texture = None
+
+# When using the renderer, the images it draws over the logical surface, as
+# lists of (image, source area, rect) tuples in drawing order, where rect is
+# where the image goes on the logical surface. Images composed while painting
+# belong to the surface being painted, and are kept until it's next painted.
+# Anything else is an overlay, which is only drawn on the next frame.
+_static = {}
+_overlays = []
+
+# The list that compose() adds images to while painting, or None when not
+# painting.
+_recording = None
+
+# The textures that images have been uploaded to, so that each is only
+# uploaded once.
+_textures = weakref.WeakKeyDictionary()
+
+# The area of the window that the logical surface is scaled into, keeping
+# its aspect ratio, and a subsurface of the window covering that area.
+_dest = None
+_view = None
+
+# Whether the whole window needs presenting on the next frame, e.g. because
+# it has been resized.
+_window_damaged = False
+
+
+def init(size, headless=False, window_size=None, fullscreen=False,
+         renderer=None):
+    """
+    Open the display.
+
+    Gamestates draw to a logical surface of the given size, which is scaled
+    to fit the window when it's presented. The window defaults to the
+    logical size, and can be resized. In fullscreen mode the window covers
+    the desktop.
+
+    By default frames are presented by blitting to the display surface. If
+    renderer is given, SDL's 2D renderer is used instead, which scales the
+    frame and composes the static images drawn with compose() on the GPU.
+    renderer is the name of an SDL render driver, such as 'opengl' or
+    'software', or 'auto' to use the best available.
+
+    In headless mode SDL's dummy video driver is used, and the logical
+    surface is never presented. This initialises pygame itself, once the
+    video driver has been selected.
+
+    """
+    global _surface, _target, _window
+
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        pygame.init()
+
+        # A display mode is still required to convert surfaces to the display
+        # format, but nothing is drawn to it so keep it tiny.
+        pygame.display.set_mode([1, 1], 0, _DEPTH)
+        _window = None
+    elif renderer is not None:
+        pygame.init()
+
+        # A renderer can't share a window with the display surface, so the
+        # display module's window is only used for its pixel format.
+        pygame.display.set_mode([1, 1], pygame.HIDDEN, _DEPTH)
+        _open_renderer(size, window_size, fullscreen, renderer)
+    else:
+        pygame.init()
+        if fullscreen:
+            pygame.display.set_mode([0, 0],
+                                    pygame.FULLSCREEN | pygame.DOUBLEBUF |
+                                    pygame.HWSURFACE,
+                                    _DEPTH)
+        else:
+            pygame.display.set_mode(window_size or size,
+                                    pygame.RESIZABLE | pygame.DOUBLEBUF |
+                                    pygame.HWSURFACE,
+                                    _DEPTH)
+        _window = pygame.display.get_surface()
+
+    _surface = make_surface(size)
+    _target = _surface
+    if not headless:
+        resize()
+
+
+def _open_renderer(size, window_size, fullscreen, driver):
+    """Open a window with a renderer, using the given render driver."""
+    global _video, _render_window, _renderer, _texture
+
+    # pygame._sdl2 is only imported here, as its API isn't guaranteed stable.
+    from pygame._sdl2 import video
+    _video = video
+
+    if driver == 'auto':
+        index = -1
+    else:
+        names = [d.name for d in video.get_drivers()]
+        if driver not in names:
+            raise ValueError('Unknown render driver {}, expected one of: {}'
+                             .format(driver, ', '.join(names)))
+        index = names.index(driver)
+
+    _render_window = video.Window(size=window_size or size,
+                                  resizable=True,
+                                  fullscreen_desktop=fullscreen)
+    _renderer = video.Renderer(_render_window, index=index)
+    _texture = video.Texture(_renderer, size, streaming=True)
+
+
+def set_caption(caption):
+    """Set the window title."""
+    if _render_window is not None:
+        _render_window.title = caption
+    else:
+        pygame.display.set_caption(caption)
+
+
+def set_icon(icon):
+    """Set the window icon."""
+    if _render_window is not None:
+        _render_window.set_icon(icon)
+    else:
+        pygame.display.set_icon(icon)
+
+
+def resize():
+    """Fit the logical surface to the window, after it has changed size."""
+    global _window, _dest, _view, _window_damaged
+
+    if _render_window is not None:
+        window_rect = pygame.Rect((0, 0), _render_window.size)
+    else:
+        _window = pygame.display.get_surface()
+        window_rect = _window.get_rect()
+    logical_rect = _surface.get_rect()
+
+    scale = min(window_rect.w / logical_rect.w,
+                window_rect.h / logical_rect.h)
+    _dest = pygame.Rect(0, 0,
+                        int(logical_rect.w * scale),
+                        int(logical_rect.h * scale))
+    _dest.center = window_rect.center
+
+    # Anything outside the destination area is a letterbox border. The
+    # renderer clears the whole window every frame, so doesn't need this.
+    if _window is not None:
+        _window.fill((0, 0, 0))
+        _view = _window.subsurface(_dest) if _dest.w and _dest.h else None
+    _window_damaged = True
+
+
+def headless():
+    """Indicate whether the game is running without a display."""
+    return _window is None and _renderer is None
+
+
+def get_surface():
+    """Get the surface to draw the game to."""
+    return _target
+
+
+@contextlib.contextmanager
+def drawing_to(surface):
+    """
+    Make get_surface() return a given surface, for use in a with statement.
+
+    The surface is usually a subsurface of the logical surface, so that
+    anything drawn to it lands in that area of the screen, in coordinates
+    relative to that area.
+
+    """
+    global _target
+    previous = _target
+    _target = surface
+    try:
+        yield surface
+    finally:
+        _target = previous
+
+
+def make_layer(size):
+    """
+    Create an opaque layer, to draw on with blit, fill and scroll.
+
+    Layers are only drawn to the screen with compose(). When using the
+    renderer, a layer is a Canvas, so drawing to it and composing it are both
+    done by the renderer. Otherwise it's a surface in the display format.
+
+    """
+    if _renderer is None:
+        return make_surface(size)
+    return Canvas(size)
+
+
+def make_surface(size, alpha=False):
+    """
+    Create a surface in the display's pixel format.
+
+    Surfaces that aren't in the display format are converted on every blit,
+    so all surfaces drawn at runtime should be created here. If alpha is True
+    the surface has per-pixel alpha, otherwise it's opaque.
+
+    """
+    if alpha:
+        return pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    else:
+        return pygame.Surface(size).convert()
+
+
+def to_logical(pos):
+    """Convert a window position to a position on the logical surface."""
+    if _dest is None or not _dest.w or not _dest.h:
+        return pos
+
+    return (int((pos[0] - _dest.x) * _surface.get_width() / _dest.w),
+            int((pos[1] - _dest.y) * _surface.get_height() / _dest.h))
+
+
+def repaint(rects, paint):
+    """
+    Call a paint function once for each damaged rect, clipped to that rect.
+
+    Blits are clipped by the surface, so the cost of the repaint scales with
+    the damaged area rather than with the size of whatever is being painted.
+    If rects is None, the whole surface is painted.
+
+    Everything drawn with compose() must be drawn on every call, whatever the
+    clip rect, as the renderer draws the images composed by the first call
+    over the whole surface.
+
+    """
+    global _recording
+
+    if rects == []:
+        return
+
+    surface = get_surface()
+    static = []
+    if _renderer is not None:
+        _static[_surface_key(surface)] = static
+
+    for rect in ([None] if rects is None else rects):
+        surface.set_clip(rect)
+        _recording = static
+        paint()
+
+        # Later calls compose the same images again, so they're dropped.
+        static = []
+    surface.set_clip(None)
+    _recording = None
+
+
+def composing():
+    """Indicate whether compose() draws with the renderer, not by blitting."""
+    return _renderer is not None
+
+
+def compose(image, pos, area=None):
+    """
+    Draw an image that doesn't change, over what's already been drawn.
+
+    This is for images such as the bezel, text rendered once and layers,
+    which the renderer keeps in textures, so it draws them over the logical
+    surface without uploading them again. An image mustn't be changed once
+    it's been composed, other than a layer created by make_layer().
+
+    Anything that has to appear over a composed image must be composed too,
+    as the renderer draws composed images over everything blitted to the
+    logical surface. Without the renderer, the image is just blitted.
+
+    """
+    surface = get_surface()
+    if _renderer is None:
+        surface.blit(image, pos, area)
+        return
+
+    # Work out what's visible on the logical surface, in the area of it that
+    # is being drawn to.
+    area = image.get_rect() if area is None else pygame.Rect(area)
+    bounds = pygame.Rect(surface.get_abs_offset(), surface.get_size())
+    rect = pygame.Rect(tuple(pos)[:2], area.size).move(bounds.topleft)
+    visible = rect.clip(bounds)
+    if not visible.w or not visible.h:
+        return
+
+    area = pygame.Rect(area.x + visible.x - rect.x,
+                       area.y + visible.y - rect.y,
+                       visible.w, visible.h)
+    images = _overlays if _recording is None else _recording
+    images.append((image, area, visible))
+
+
+def present(rects):
+    """
+    Present a drawn frame.
+
+    rects is the list of rects that changed since the last frame, or None if
+    the whole screen changed.
+
+    """
+    global _window_damaged
+
+    if headless():
+        return
+
+    if _window_damaged:
+        rects = None
+        _window_damaged = False
+
+    if _renderer is not None:
+        _present_renderer(rects)
+    elif _view is not None:
+        _present_surface(rects)
+
+
+def _present_surface(rects):
+    """Present a frame by blitting it to the display surface."""
+    if _dest.size == _surface.get_size():
+        # No scaling needed, so only copy what changed.
+        for rect in ([_surface.get_rect()] if rects is None else rects):
+            _view.blit(_surface, rect, rect)
+    elif rects is None or rects:
+        # The whole surface is scaled in one go. Scaling damaged rects
+        # separately would leave seams where their edges round differently.
+        pygame.transform.scale(_surface, _dest.size, _view)
+
+    if rects is None:
+        pygame.display.flip()
+    elif rects:
+        window_rects = [_to_window(r) for r in rects]
+        damaged = sum(r.w * r.h for r in window_rects)
+        if damaged > (_dest.w * _dest.h) * _FULL_UPDATE_FRACTION:
+            pygame.display.flip()
+        else:
+            pygame.display.update(window_rects)
+
+
+def _present_renderer(rects):
+    """
+    Present a frame with the renderer.
+
+    Only the damaged parts of the logical surface are uploaded to the
+    texture. The renderer then scales the texture into the window, and draws
+    the composed images over it.
+
+    """
+    global _overlays
+
+    overlays = _overlays
+    _overlays = []
+
+    if rects is None:
+        _texture.update(_surface)
+    elif rects:
+        surface_rect = _surface.get_rect()
+        for rect in rects:
+            rect = rect.clip(surface_rect)
+            if rect.w and rect.h:
+                _texture.update(_surface.subsurface(rect), rect)
+    else:
+        # Nothing changed, so what's in the window is still correct.
+        return
+
+    _renderer.draw_color = (0, 0, 0, 255)
+    _renderer.clear()
+    if _dest.w and _dest.h:
+        _texture.draw(dstrect=_dest)
+        for images in list(_static.values()) + [overlays]:
+            for image, area, rect in images:
+                _texture_for(image).draw(area, _to_dest(rect))
+    _renderer.present()
+
+
+def _texture_for(image):
+    """Get the texture for an image, uploading it the first time."""
+    if isinstance(image, Canvas):
+        return image.texture
+
+    texture = _textures.get(image)
+    if texture is None:
+        texture = _video.Texture.from_surface(_renderer, image)
+        _textures[image] = texture
+    return texture
+
+
+def _surface_key(surface):
+    """Get the area of the logical surface that a surface draws to."""
+    return surface.get_abs_offset(), surface.get_size()
+
+
+def _to_dest(rect):
+    """Scale a rect on the logical surface to where it is drawn on screen."""
+    # Every edge is rounded the same way, so scaled images line up with each
+    # other and with the logical surface.
+    scale_x = _dest.w / _surface.get_width()
+    scale_y = _dest.h / _surface.get_height()
+    left = _dest.x + round(rect.left * scale_x)
+    top = _dest.y + round(rect.top * scale_y)
+    return pygame.Rect(left, top,
+                       _dest.x + round(rect.right * scale_x) - left,
+                       _dest.y + round(rect.bottom * scale_y) - top)
+
+
+def _to_window(rect):
+    """Convert a rect on the logical surface to the window area it covers."""
+    scale_x = _dest.w / _surface.get_width()
+    scale_y = _dest.h / _surface.get_height()
+    left = _dest.x + math.floor(rect.left * scale_x)
+    top = _dest.y + math.floor(rect.top * scale_y)
+    return pygame.Rect(left, top,
+                       _dest.x + math.ceil(rect.right * scale_x) - left,
+                       _dest.y + math.ceil(rect.bottom * scale_y) - top)
+
+
+@contextlib.contextmanager
+def _rendering_to(texture):
+    """Make the renderer draw to a texture, for use in a with statement."""
+    _renderer.target = texture
+    try:
+        yield
+    finally:
+        _renderer.target = None
+
+
+class Canvas:
+
+    """
+    An opaque layer kept in a texture, which the renderer draws on.
+
+    This has the parts of the Surface API that layers are drawn with. Images
+    blitted onto it are uploaded to textures the first time, like composed
+    images, so drawing text from a glyph atlas only copies from the atlas's
+    texture. Scrolling copies the layer into a second texture, and swaps
+    them over.
+
+    """
+
+    def __init__(self, size):
+        """Initialize the class."""
+        self._size = tuple(size)
+        self._textures = [_video.Texture(_renderer, size, target=True)
+                          for _ in range(2)]
+        for texture in self._textures:
+            texture.blend_mode = 0
+        self.texture = self._textures[0]
+
+    def get_size(self):
+        """Get the size of the layer."""
+        return self._size
+
+    def get_width(self):
+        """Get the width of the layer."""
+        return self._size[0]
+
+    def get_height(self):
+        """Get the height of the layer."""
+        return self._size[1]
+
+    def get_rect(self):
+        """Get a rect covering the layer."""
+        return pygame.Rect((0, 0), self._size)
+
+    def fill(self, colour, rect=None):
+        """Fill the layer, or an area of it, with a solid colour."""
+        with _rendering_to(self.texture):
+            _renderer.draw_color = tuple(colour[:3]) + (255,)
+            if rect is None:
+                _renderer.clear()
+            else:
+                _renderer.fill_rect(pygame.Rect(rect))
+
+    def scroll(self, dx=0, dy=0):
+        """Move what's on the layer, leaving uncovered areas as they were."""
+        back = self._textures[1]
+        with _rendering_to(back):
+            self.texture.draw(dstrect=self.get_rect())
+            self.texture.draw(dstrect=self.get_rect().move(dx, dy))
+        self._textures.reverse()
+        self.texture = back
+
+    def blit(self, image, pos, area=None):
+        """Draw an image onto the layer."""
+        self.blits([(image, pos, area)])
+
+    def blits(self, blits, doreturn=False):
+        """Draw a sequence of (image, pos, area) tuples onto the layer."""
+        with _rendering_to(self.texture):
+            for image, pos, *area in blits:
+                area = (image.get_rect() if not area or area[0] is None
+                        else pygame.Rect(area[0]))
+                _texture_for(image).draw(
+                    area, pygame.Rect(tuple(pos)[:2], area.size))
@@ -0,0 +1,128 @@
+"""Scripted input, for driving the game without a player."""
+
+import pygame
+
+import mouse
+
+
+class ScriptError(Exception):
+
+    """Exception raised for a malformed input script."""
+
+    pass
+
+
+class InputScript:
+
+    """
+    A script of input events to feed to the game.
+
+    Scripts are text files with one command per line. Blank lines and lines
+    starting with '#' are ignored. The commands are:
+
+        wait <ms>               Wait for the given simulation time.
+        type <text>             Type some text, then press return.
+        key <name>              Press and release a key, e.g. 'key TAB'.
+        move <x> <y>            Move the mouse.
+        click <x> <y> [button]  Click a mouse button, left by default.
+        quit                    Quit the game.
+
+    Commands other than wait all happen at the same simulation time, so
+    scripts generally need to wait for the game to react between commands.
+
+    """
+
+    def __init__(self, filename):
+        """Initialize the class."""
+        with open(filename) as f:
+            self._commands = [self._parse(line, num + 1)
+                              for num, line in enumerate(f)
+                              if line.strip() and
+                              not line.lstrip().startswith('#')]
+        self._next = 0
+        self._time = 0
+        self._wait_until = 0
+
+    @property
+    def finished(self):
+        """Indicate whether every command in the script has run."""
+        return (self._next == len(self._commands) and
+                self._time >= self._wait_until)
+
+    def events(self, time):
+        """Get the events due at a given simulation time."""
+        self._time = time
+
+        events = []
+        while self._next < len(self._commands) and time >= self._wait_until:
+            cmd, args = self._commands[self._next]
+            self._next += 1
+
+            if cmd == 'wait':
+                self._wait_until = time + args[0]
+            else:
+                events.extend(cmd(*args))
+
+        return events
+
+    @staticmethod
+    def _parse(line, num):
+        """Parse a single line of the script."""
+        name, _, arg = line.strip().partition(' ')
+        try:
+            if name == 'wait':
+                return 'wait', [int(arg)]
+            elif name == 'type':
+                return InputScript._type, [arg]
+            elif name == 'key':
+                return InputScript._key, [getattr(pygame, 'K_' + arg), '']
+            elif name == 'move':
+                return InputScript._move, [tuple(int(a) for a in
+                                                 arg.split())]
+            elif name == 'click':
+                args = [int(a) for a in arg.split()]
+                return InputScript._click, [tuple(args[:2]),
+                                            args[2] if len(args) > 2 else
+                                            mouse.Button.LEFT]
+            elif name == 'quit':
+                return InputScript._quit, []
+        except (AttributeError, ValueError, IndexError):
+            raise ScriptError('Bad arguments on line {}: {}'.format(
+                num, line.strip()))
+
+        raise ScriptError('Unknown command on line {}: {}'.format(
+            num, line.strip()))
+
+    @staticmethod
+    def _key(key, key_unicode):
+        """Get the events that press and release a key."""
+        return [pygame.event.Event(pygame.KEYDOWN, key=key,
+                                   unicode=key_unicode, mod=0),
+                pygame.event.Event(pygame.KEYUP, key=key,
+                                   unicode=key_unicode, mod=0)]
+
+    @staticmethod
+    def _type(text):
+        """Get the events that type some text, then press return."""
+        events = []
+        for c in text:
+            events.extend(InputScript._key(ord(c), c))
+        return events + InputScript._key(pygame.K_RETURN, '\r')
+
+    @staticmethod
+    def _move(pos):
+        """Get the event that moves the mouse."""
+        return [pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0),
+                                   buttons=(0, 0, 0))]
+
+    @staticmethod
+    def _click(pos, button):
+        """Get the event that clicks a mouse button."""
+        # The game only handles presses, so no release is sent.
+        return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos,
+                                   button=button)]
+
+    @staticmethod
+    def _quit():
+        """Get the event that quits the game."""
+        return [pygame.event.Event(pygame.QUIT)]
@@ -0,0 +1,50 @@
+"""Terminal scrollback - a fixed size store of output lines."""
+
+
+class Scrollback:
+
+    """
+    Ring buffer of lines, indexed from the newest line.
+
+    Appending, indexing and clearing are all O(1). When the buffer is full,
+    appending a line drops the oldest one.
+
+    """
+
+    def __init__(self, capacity):
+        """Initialize the class."""
+        self._lines = [None] * capacity
+        self._capacity = capacity
+
+        # The index in _lines that the next line will be stored at, and the
+        # number of lines stored.
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        """Get the number of lines stored."""
+        return self._len
+
+    def __getitem__(self, idx):
+        """Get a line, where line 0 is the newest."""
+        if not 0 <= idx < self._len:
+            raise IndexError('scrollback index out of range')
+        return self._lines[(self._next - 1 - idx) % self._capacity]
+
+    def append(self, line):
+        """Add a new line."""
+        self._lines[self._next] = line
+        self._next = (self._next + 1) % self._capacity
+        self._len = min(self._len + 1, self._capacity)
+
+    def clear(self):
+        """Remove all the lines."""
+        # Old lines are left in place to be overwritten, as they are never
+        # read beyond the length.
+        self._next = 0
+        self._len = 0
+
+    def window(self, start, count):
+        """Generate up to count lines, newest first, starting at line start."""
+        for idx in range(start, min(start + count, self._len)):
+            yield self._lines[(self._next - 1 - idx) % self._capacity]
@@ -0,0 +1,216 @@
+"""Sessions - several games running at once, each in its own viewport."""
+
+import math
+
+import pygame
+
+import screen
+import timer
+import util
+from gamestate import GameStateManager
+
+# The size of each session's viewport, which is the size that gamestates are
+# laid out for.
+SESSION_SIZE = (800, 600)
+
+
+def screen_size(count):
+    """Get the size of the logical surface needed for a number of sessions."""
+    cols, rows = _grid(count)
+    return SESSION_SIZE[0] * cols, SESSION_SIZE[1] * rows
+
+
+def _grid(count):
+    """Get the columns and rows of the grid of sessions, as near square."""
+    cols = math.ceil(math.sqrt(count))
+    return cols, math.ceil(count / cols)
+
+
+class Session:
+
+    """A game with its own gamestates, drawn to a viewport of the screen."""
+
+    def __init__(self, rect):
+        """Initialize the class."""
+        self.rect = rect
+        self.gamestates = GameStateManager()
+
+        # Gamestates draw to a subsurface of the logical surface, so what
+        # they draw lands straight in the viewport, without any copying.
+        self.surface = screen.get_surface().subsurface(rect)
+
+        # Whether the viewport has been cleared since the session ended.
+        self.cleared = False
+
+
+class SessionManager:
+
+    """
+    Class to run several sessions at once, in a grid of viewports.
+
+    This has the same interface as GameStateManager, so the game loop can run
+    any number of sessions the same way it runs one.
+
+    Each session is run and drawn with screen.get_surface() returning its
+    viewport, so gamestates don't need to know where they are on the screen.
+    Fonts, glyph atlases, bezels and program assets are all cached by what
+    they are rather than by who is using them, so every session shares them.
+
+    Mouse input goes to the session under the pointer, and clicking a session
+    gives it the keyboard focus. Keypresses only go to the focused session,
+    and the others are told they have lost the input focus, as if each were
+    in its own window.
+
+    """
+
+    def __init__(self, count, first_state):
+        """
+        Start a number of sessions.
+
+        first_state is called with each session's GameStateManager, to create
+        the first gamestate that the session shows.
+
+        """
+        cols, _ = _grid(count)
+        self._sessions = []
+        for idx in range(count):
+            row, col = divmod(idx, cols)
+            session = Session(pygame.Rect(
+                (col * SESSION_SIZE[0], row * SESSION_SIZE[1]), SESSION_SIZE))
+            with screen.drawing_to(session.surface):
+                session.gamestates.push(first_state(session.gamestates))
+            self._sessions.append(session)
+
+        # The session with the keyboard focus, and the session the pointer was
+        # last over, which is drawn last so that it decides the mouse cursor.
+        self._focus = 0
+        self._hovered = 0
+
+        # Events to be fed to each session on the next step, ahead of any
+        # input. Every session but the first starts without the focus.
+        self._queued = [[] for _ in self._sessions]
+        for queued in self._queued[1:]:
+            queued.append(_focus_event(False))
+
+    def step(self, events, ms):
+        """Advance the simulation by a single step of a given length."""
+        timer.advance(ms)
+        self.run(events)
+
+    def run(self, events):
+        """Run every session, with the events routed to it."""
+        routed = self._route(events)
+        for session, session_events in zip(self._sessions, routed):
+            with screen.drawing_to(session.surface):
+                session.gamestates.run(session_events)
+
+    def draw(self):
+        """
+        Draw every session.
+
+        Returns the list of screen rects that changed, or None if the whole
+        screen changed.
+
+        """
+        hovered = self._sessions[self._hovered]
+        rects = []
+        full = True
+        for session in sorted(self._sessions, key=lambda s: s is hovered):
+            with screen.drawing_to(session.surface):
+                drawn = self._draw_session(session)
+
+            if drawn is None:
+                rects.append(session.rect)
+            else:
+                full = False
+                rects.extend(r.move(session.rect.topleft).clip(session.rect)
+                             for r in drawn)
+
+        return None if full else rects
+
+    def invalidate(self):
+        """Force every session to redraw its whole viewport."""
+        for session in self._sessions:
+            session.gamestates.invalidate()
+            session.cleared = False
+
+    def busy(self):
+        """Indicate whether any session needs a full frame rate."""
+        return any(s.gamestates.busy() for s in self._sessions)
+
+    def profile_label(self):
+        """Get the profiling label of the sessions' current gamestates."""
+        return ', '.join(s.gamestates.profile_label() for s in self._sessions
+                         if not s.gamestates.empty())
+
+    def empty(self):
+        """Indicate whether every session has ended."""
+        return all(s.gamestates.empty() for s in self._sessions)
+
+    @staticmethod
+    def _draw_session(session):
+        """Draw a session to its viewport, returning the rects that changed."""
+        if not session.gamestates.empty():
+            return session.gamestates.draw()
+
+        # The session has ended, so just blank its viewport.
+        if session.cleared:
+            return []
+        screen.repaint(None, _blank)
+        session.cleared = True
+        return None
+
+    def _route(self, events):
+        """Split events into a list of the events for each session."""
+        routed = self._queued
+        self._queued = [[] for _ in self._sessions]
+
+        for event in events:
+            if hasattr(event, 'pos'):
+                # Mouse events go to the session under the mouse.
+                idx = self._session_at(event.pos)
+                if idx is None:
+                    continue
+                if event.type == pygame.MOUSEBUTTONDOWN and idx != self._focus:
+                    routed[self._focus].append(_focus_event(False))
+                    routed[idx].append(_focus_event(True))
+                    self._focus = idx
+                self._hovered = idx
+
+                # Positions are made relative to the session's viewport.
+                rect = self._sessions[idx].rect
+                routed[idx].append(pygame.event.Event(
+                    event.type, event.dict,
+                    pos=(event.pos[0] - rect.x, event.pos[1] - rect.y)))
+            elif event.type == pygame.MOUSEWHEEL:
+                # Wheel events have no position of their own, so go to the
+                # session the mouse was last over.
+                routed[self._hovered].append(event)
+            elif event.type in (pygame.KEYDOWN, pygame.ACTIVEEVENT):
+                routed[self._focus].append(event)
+            else:
+                # Anything else, including key releases, goes to every
+                # session, so a key held while the focus moves isn't left
+                # held in the session that saw it pressed.
+                for session_events in routed:
+                    session_events.append(event)
+
+        return routed
+
+    def _session_at(self, pos):
+        """Get the index of the session at a screen position, or None."""
+        for idx, session in enumerate(self._sessions):
+            if session.rect.collidepoint(pos):
+                return idx
+        return None
+
+
+def _blank():
+    """Blank the surface being drawn to."""
+    screen.get_surface().fill((0, 0, 0))
+
+
+def _focus_event(gained):
+    """Create an event for a session gaining or losing the input focus."""
+    return pygame.event.Event(pygame.ACTIVEEVENT, gain=int(gained),
+                              state=util.ActiveEvent.APP_INPUT_FOCUS)
@@ -0,0 +1,248 @@
+"""Snapshots - save a game in progress, so that it can be restored later."""
+
+import io
+import logging
+import os
+import pickle
+import queue
+import threading
+import zlib
+
+import pygame
+
+import resources
+
+# The version of the snapshot format. Snapshots in any other version are
+# ignored, as the classes they were saved from may have changed.
+_VERSION = 2
+
+# The modules that the classes in a snapshot can come from, along with the
+# only other classes and functions allowed. Anything else in an autosave file
+# is refused, so the file can't be used to run other code.
+_GAME_MODULES = ('completion', 'dependencies', 'markup', 'programs',
+                 'scrollback', 'terminal', 'timer')
+_OTHER_CLASSES = {('builtins', 'set'), ('builtins', 'frozenset'),
+                  ('collections', 'OrderedDict'), ('collections', 'deque'),
+                  ('copyreg', '_reconstructor'),
+                  ('pygame', '__rect_constructor'),
+                  ('pygame', '__color_constructor')}
+
+# The autosave file that games in progress are saved to. Autosaving does
+# nothing unless open_autosave() is called first.
+_autosave = None
+
+
+class SnapshotError(Exception):
+
+    """Exception raised for a snapshot that can't be restored."""
+
+    pass
+
+
+def dumps(state):
+    """
+    Save a game's state as bytes.
+
+    Fonts and images loaded from the game's media are saved by name, and
+    loaded again when the state is restored. Anything else that is only used
+    for drawing should be left out of the state by the objects it belongs to,
+    and rebuilt when they're restored.
+
+    """
+    f = io.BytesIO()
+    _Pickler(f, pickle.HIGHEST_PROTOCOL).dump(state)
+    return f.getvalue()
+
+
+def loads(data):
+    """Restore a game's state from bytes created by dumps()."""
+    try:
+        return _Unpickler(io.BytesIO(data)).load()
+    except (pickle.UnpicklingError, pygame.error, AttributeError, EOFError,
+            ImportError, IndexError, KeyError, OSError, TypeError,
+            ValueError) as e:
+        raise SnapshotError('Could not restore snapshot: {}'.format(e))
+
+
+def open_autosave(filename):
+    """Autosave games in progress to a file, from now on."""
+    global _autosave
+    close_autosave()
+    _autosave = Autosave(filename)
+
+
+def autosaving():
+    """Indicate whether games in progress are being autosaved."""
+    return _autosave is not None
+
+
+def autosave(state):
+    """Autosave a game's state, if autosaving is on."""
+    if _autosave is not None:
+        _autosave.save(state)
+
+
+def has_autosave():
+    """Indicate whether there's an autosaved game, without loading it."""
+    return _autosave is not None and _autosave.exists()
+
+
+def load_autosave():
+    """Get the autosaved game state, or None if there isn't one."""
+    return _autosave.load() if _autosave is not None else None
+
+
+def clear_autosave():
+    """Remove the autosaved game, once it has ended."""
+    if _autosave is not None:
+        _autosave.clear()
+
+
+def close_autosave():
+    """Finish writing the autosave file, if autosaving is on."""
+    if _autosave is not None:
+        _autosave.close()
+
+
+class Autosave:
+
+    """
+    A file holding the latest snapshot of a game in progress.
+
+    The state is converted to bytes straight away, so that it can't change
+    before it's saved, but compressing it and writing it to the file are done
+    by a background thread, so the game never waits on the disk. The file is
+    replaced in one go, so a crash part way through a write leaves the
+    previous save intact.
+
+    """
+
+    def __init__(self, filename):
+        """Initialize the class."""
+        self._filename = filename
+
+        # Writes queued for the writer thread. Each item is the snapshot
+        # bytes to write, an empty bytes object to remove the file, or None
+        # to stop the thread.
+        self._writes = queue.Queue()
+        self._writer = None
+
+    def save(self, state):
+        """Queue a state to be written."""
+        self._write(dumps({'version': _VERSION, 'state': state}))
+
+    def exists(self):
+        """Indicate whether the file exists."""
+        return os.path.exists(self._filename)
+
+    def load(self):
+        """Read the saved state, or None if there isn't a usable one."""
+        try:
+            with open(self._filename, 'rb') as f:
+                saved = loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, SnapshotError) as e:
+            logging.warning('Could not read autosave file: %s', e)
+            return None
+
+        if not isinstance(saved, dict) or saved.get('version') != _VERSION:
+            return None
+        return saved['state']
+
+    def clear(self):
+        """Queue the file to be removed."""
+        self._write(b'')
+
+    def close(self):
+        """Finish any writes that are still queued."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _write(self, data):
+        """Queue a write for the writer thread, starting it if need be."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer,
+                                            name='autosave-writer',
+                                            daemon=True)
+            self._writer.start()
+        self._writes.put(data)
+
+    def _run_writer(self):
+        """Do the queued writes, until told to stop."""
+        while True:
+            data = self._writes.get()
+            if data is None:
+                return
+
+            try:
+                if data:
+                    self._replace(zlib.compress(data))
+                elif os.path.exists(self._filename):
+                    os.remove(self._filename)
+            except OSError as e:
+                logging.warning('Could not write autosave file: %s', e)
+
+    def _replace(self, data):
+        """Replace the file with the given contents."""
+        temp = self._filename + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, self._filename)
+
+
+class _Pickler(pickle.Pickler):
+
+    """Pickler that saves loaded media by name."""
+
+    def persistent_id(self, obj):
+        """Get the name to save an object by, or None to save it normally."""
+        if not isinstance(obj, (pygame.Surface, pygame.font.Font)):
+            return None
+
+        key = resources.media_key(obj)
+        if key is None:
+            raise pickle.PicklingError(
+                "Can't snapshot a {} that isn't loaded media".format(
+                    type(obj).__name__))
+        return key
+
+
+class _Unpickler(pickle.Unpickler):
+
+    """Unpickler that loads media by name, and only creates game objects."""
+
+    def persistent_load(self, pid):
+        """Load the media saved by a given name."""
+        # Images are saved by filename, and fonts by (filename, size).
+        if not (isinstance(pid, str) or
+                (isinstance(pid, tuple) and len(pid) == 2 and
+                 isinstance(pid[0], str) and isinstance(pid[1], int))):
+            raise pickle.UnpicklingError(
+                'Snapshot contains media {!r}'.format(pid))
+        return resources.load_media(pid)
+
+    def find_class(self, module, name):
+        """Get a class that an object in the snapshot is an instance of."""
+        if (module, name) in _OTHER_CLASSES:
+            return super().find_class(module, name)
+
+        # Only classes defined in the game's modules are allowed. A dotted name
+        # is followed one class at a time, as it's only allowed for a class
+        # nested in another, and could otherwise reach anything the module
+        # imports, such as random._os.system.
+        if module.split('.')[0] in _GAME_MODULES:
+            obj = None
+            for part in name.split('.'):
+                obj = (super().find_class(module, part) if obj is None
+                       else getattr(obj, part, None))
+                if not (isinstance(obj, type) and obj.__module__ == module):
+                    break
+            else:
+                if obj.__qualname__ == name:
+                    return obj
+
+        raise pickle.UnpicklingError(
+            'Snapshot contains {}.{}'.format(module, name))
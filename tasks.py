@@ -0,0 +1,59 @@
+"""Tasks - generators that run over time, such as timed terminal output."""
+
+
+class Scheduler:
+
+    """
+    Run generator based tasks against a clock.
+
+    A task is a generator that yields the number of ms to wait before it
+    continues. Each time the scheduler is run, every task whose wait has
+    ended is resumed, as many times as it takes to catch up with the clock.
+    Waits are measured from when they were due rather than from when the task
+    was actually resumed, so a task's timing doesn't depend on how often the
+    scheduler is run. A task that yields 0 isn't resumed again until the
+    next run, so it can't keep the scheduler from returning.
+
+    """
+
+    def __init__(self):
+        """Initialize the class."""
+        # A list of [task, time it's next due] lists.
+        self._tasks = []
+
+    def __len__(self):
+        """Get the number of tasks that haven't finished."""
+        return len(self._tasks)
+
+    def start(self, task, time):
+        """Start a task, which is first resumed at the given time."""
+        self._tasks.append([task, time])
+        return task
+
+    def clear(self):
+        """Stop all the tasks."""
+        tasks, self._tasks = self._tasks, []
+        for task, _ in tasks:
+            task.close()
+
+    def run(self, time):
+        """Resume every task that's due at the given time."""
+        for entry in list(self._tasks):
+            # Skip tasks that an earlier task stopped, e.g. by rebooting.
+            if entry not in self._tasks:
+                continue
+
+            task, due = entry
+            while due <= time:
+                try:
+                    wait = next(task)
+                except StopIteration:
+                    self._tasks.remove(entry)
+                    break
+
+                if wait <= 0:
+                    # Carry on from the next run.
+                    due = time + 1
+                    break
+                due += wait
+            entry[1] = due
@@ -1,19 +1,27 @@
 """Module containing the terminal class, the main gameplay logic."""
 
-import re
+import functools
 import itertools
 import random
 import string
-import os
-from collections import deque
 
 import pygame
 
 import constants
+import glyphs
+import history
+import markup
 import timer
 import mouse
+import screen
+import snapshot
+from commands import Command, CommandRegistry, UsageError
+from dependencies import DependencyGraph
+from events import EventBus, GameEvent
 from resources import load_font
 from programs.program import BadInput
+from scrollback import Scrollback
+from tasks import Scheduler
 from util import render_bezel
 
 
@@ -23,8 +31,7 @@ class Terminal:
 
     _ACCEPTED_CHARS = (string.ascii_letters + string.digits +
                        string.punctuation + " ")
-    _BUF_SIZE = 100
-    _HISTORY_SIZE = 50
+    _SCROLLBACK_SIZE = 10000
 
     _TIMER_POS = (0, 0)
     _TIMER_WARNING_SECS = 30
@@ -34,20 +41,26 @@ class Terminal:
     _TEXT_FONT = constants.TERMINAL_FONT
     _TEXT_SIZE = constants.TERMINAL_TEXT_SIZE
     _TEXT_COLOUR = constants.TEXT_COLOUR
-    _TEXT_COLOURS = {
-        "g": constants.TEXT_COLOUR,
-        "r": constants.TEXT_COLOUR_RED,
-        "w": constants.TEXT_COLOUR_WHITE,
-    }
 
     # Constants related to cursor
     _CURSOR_WIDTH = 6
     _CURSOR_ON_MS = 800
     _CURSOR_OFF_MS = 600
 
+    # Images of the cursor, by size, colour and border width.
+    _cursors = {}
+
     # The coordinates to start drawing text.
     _TEXT_START = (45, 541)
 
+    # The width that lines are wrapped to, leaving the same margin inside the
+    # bezel on the right as on the left.
+    _TEXT_WIDTH = 710
+
+    # The number of lines to scroll for a page, and for a mouse wheel click.
+    _PAGE_LINES = _VISIBLE_LINES - 2
+    _WHEEL_LINES = 3
+
     # Freeze progress bar size
     _PROGRESS_BAR_SIZE = 30
 
@@ -59,6 +72,7 @@ class Terminal:
         """Initialize the class."""
         # Public attributes
         self.locked = False
+        self.events = EventBus()
         self.id_string = ''.join(
             random.choice(string.ascii_uppercase + string.digits)
             for _ in range(4))
@@ -66,10 +80,15 @@ class Terminal:
         # Current line without prompt. If current line with prompt is required,
         # use get_current_line(True)
         self._current_line = ""
-        self._buf = deque(maxlen=Terminal._BUF_SIZE)
+        self._buf = Scrollback(Terminal._SCROLLBACK_SIZE)
+
+        # The number of lines the view is scrolled back from the newest line.
+        self._scroll = 0
+
         self._prompt = prompt
-        self._cmd_history = CommandHistory(self, maxlen=Terminal._HISTORY_SIZE)
+        self._cmd_history = CommandHistory(self, history.get_store())
         self._font = load_font(Terminal._TEXT_FONT, Terminal._TEXT_SIZE)
+        self._text_colour = Terminal._TEXT_COLOUR
         self._has_focus = True
 
         # Timer attributes
@@ -81,10 +100,10 @@ class Terminal:
         self._freeze_start = None
         self._freeze_time = None
 
-        # Reboot attributes
+        # Tasks that run over time, such as printing the reboot banner.
+        self._tasks = Scheduler()
         self._rebooting = False
-        self._reboot_update_time = 0
-        self._reboot_buf = deque()
+        self._reboot_msg = ""
 
         # Repeat key presses when certain keys are held.
         # Held key is a tuple of (key, key_unicode, start time)
@@ -93,91 +112,188 @@ class Terminal:
 
         # Create instances of the programs that have been registered.
         self._programs = {c: p(self) for c, p in programs.items()}
+        self._program_cmds = {p: c for c, p in self._programs.items()}
         self._current_program = None
+
+        # The commands of the programs that haven't been completed yet, and
+        # which commands block which. Both are kept up to date as programs
+        # are completed. Compiling the dependencies raises DependencyError if
+        # they could never all be met.
         self._depends = {} if depends is None else depends
+        self._remaining = set(self._programs)
+        self._dependencies = DependencyGraph(
+            {c: self._depends.get(c, []) for c in self._programs})
+        self.events.subscribe(GameEvent.PROGRAM_COMPLETED,
+                              self._on_program_completed)
+
+        # The commands that can be typed at the prompt.
+        self._commands = None
+        self._register_commands()
 
         # Draw the monitor bezel
         self._bezel = render_bezel(self.id_string)
         self._bezel_off = render_bezel(self.id_string, power_off=True)
 
+        # The output lines above the current line's rows are kept drawn on a
+        # layer.
+        self._text_layer = TextLayer(
+            (screen.get_surface().get_width() - Terminal._TEXT_START[0],
+             Terminal._TEXT_START[1]),
+            self._draw_line)
+
+        # The lines of text and cursor to draw, how many of the lines are rows
+        # of the current line, and what was on screen after the last draw.
+        # The current line always takes at least one row.
+        self._rows = []
+        self._current_rows = 1
+        self._cursor = None
+        self._full_redraw = True
+        self._drawn_rows = []
+        self._drawn_cursor = None
+        self._drawn_program = None
+
+        # The parsed lines of the current program's buf, and the program and
+        # buf version they were read from.
+        self._program_buf = []
+        self._program_buf_key = None
+
         self.reboot()
 
-    def _process_command(self, cmd):
-        """Process a completed command."""
-        if cmd in self._programs:
-            # Check dependencies for this command
-            if self._is_cmd_runnable(cmd):
-                # Create a new instance of the program
-                self._current_program = self._programs[cmd]
-
-                # Don't run the program if it is already completed
-                if not self._current_program.completed():
-                    self._current_program.start()
-                else:
-                    self.output(["{} already completed!"
-                                 .format(self._current_program.security_type)
-                                 .capitalize()])
-                    self._current_program = None
-
-        elif cmd in ('help', '?'):
-            sorted_cmds = sorted(self._programs.items(),
-                                 key=lambda i: i[0])
-            self.output(["Available commands:"] +
-                        ["  {:10}   {}".format(c, p.help)
-                         for c, p in sorted_cmds])
+    def _register_commands(self):
+        """Register the commands that can be typed at the prompt."""
+        self._commands = CommandRegistry()
+        self._commands.register(Command('help', self._show_help,
+                                        help="List the available commands."),
+                                aliases=('?',), listed=False)
+        for cmd, program in self._programs.items():
+            # Subcommands are blocked by the same dependencies as the program.
+            subcommands = [c._replace(run=functools.partial(
+                               self._run_subcommand, cmd, c.run))
+                           for c in program.subcommands]
+            self._commands.register(Command(
+                cmd, functools.partial(self._start_program, cmd),
+                help=program.help,
+                subcommands=(CommandRegistry(subcommands)
+                             if subcommands else None)))
 
         # Easter egg!
-        elif cmd.startswith("colour "):
-            args = cmd.split(" ")[1:]
-            if len(args) == 3:
-                try:
-                    # Get colour and try a render to make sure code correct
-                    colour = tuple(int(a) for a in args)
-                    self._font.render("test", True, colour)
-                    Terminal._TEXT_COLOUR = colour
-                except (ValueError, TypeError):
-                    self.output(["I am not familiar with that colour code."])
-                else:
-                    self.output(["Enjoy your new colour!"])
+        self._commands.register(Command('colour', self._set_colour,
+                                        args=None))
 
         # Freeze test
-        elif cmd.startswith("freeze "):
+        self._commands.register(Command('freeze', self._freeze_command,
+                                        args=None))
+
+    def _process_command(self, cmd):
+        """Process a completed command."""
+        words = cmd.split()
+        if not words:
+            return
+
+        try:
+            if not self._commands.dispatch(words):
+                self._add_to_buf(["Unknown command '{}'.".format(cmd)],
+                                 plain=True)
+        except UsageError as e:
+            self.output([str(e)])
+
+    def _start_program(self, cmd):
+        """Start the program for a command."""
+        # Check dependencies for this command
+        if self._is_cmd_runnable(cmd):
+            # Create a new instance of the program
+            self._current_program = self._programs[cmd]
+
+            # Don't run the program if it is already completed
+            if not self._current_program.completed():
+                self._current_program.start()
+            else:
+                self.output(["{} already completed!"
+                             .format(self._current_program.security_type)
+                             .capitalize()])
+                self._current_program = None
+
+    def _run_subcommand(self, cmd, run, *args):
+        """Run a subcommand of the program for a command."""
+        if self._is_cmd_runnable(cmd):
+            run(*args)
+
+    def _show_help(self):
+        """List the available commands."""
+        self.output(self._commands.help())
+
+    def _set_colour(self, *args):
+        """Change the colour of the terminal text."""
+        if not args:
+            return False
+
+        if len(args) == 3:
             try:
-                self.freeze(int(cmd.split(" ")[1]))
-            except ValueError:
-                self.output(["Invalid time"])
+                # Get colour and try a render to make sure code correct
+                colour = tuple(int(a) for a in args)
+                self._font.render("test", True, colour)
+            except (ValueError, TypeError):
+                self.output(["I am not familiar with that colour code."])
+            else:
+                self._text_colour = colour
+                self.output(["Enjoy your new colour!"])
 
-        elif cmd:
-            self.output(["Unknown command '{}'.".format(cmd)])
+    def _freeze_command(self, *args):
+        """Freeze the terminal for a typed time."""
+        if not args:
+            return False
 
-    def _is_cmd_runnable(self, cmd):
-        depends_list = self._depends.get(cmd)
-        if depends_list is None:
-            blocked_on = []
-        else:
-            # Get blocked-on list
-            blocked_on = [self._programs[c] for c in depends_list
-                          if not self._programs[c].completed()]
+        try:
+            self.freeze(int(args[0]))
+        except ValueError:
+            self.output(["Invalid time"])
+
+    def _on_program_completed(self, program):
+        """Stop waiting for a program that has been completed."""
+        cmd = self._program_cmds[program]
+        if cmd in self._remaining:
+            self._remaining.remove(cmd)
+            self._dependencies.complete(cmd)
 
-        if len(blocked_on) == 0:
+    def _is_cmd_runnable(self, cmd):
+        if not self._dependencies.is_blocked(cmd):
             return True
         else:
             self.output(["{} currently blocked by: {}".format(
-                cmd, ", ".join(p.security_type for p in blocked_on)
+                cmd, ", ".join(self._programs[c].security_type
+                               for c in self._dependencies.blocked_by(cmd))
             )])
             return False
 
-    def _add_to_buf(self, lines):
-        """Add lines to the display buffer."""
+    def _add_to_buf(self, lines, plain=False):
+        """
+        Add lines to the display buffer, parsing any markup.
+
+        If plain is True, the lines are added as they are, without parsing
+        markup. This is used for lines that echo what the user typed.
+
+        """
         for line in lines:
-            # The buffer is ordered left to right from newest to oldest.
-            # This will push old lines off the end of the buffer if it is full.
-            self._buf.appendleft(line)
+            # Lines are stored already wrapped, so the buffer holds rows as
+            # they appear on screen. This will push the oldest rows out of
+            # the buffer if it is full.
+            rows = self._wrap(markup.plain(line) if plain
+                              else markup.parse(line))
+            for row in rows:
+                self._buf.append(row)
+
+            # Keep a scrolled back view on the same lines.
+            if self._scroll:
+                self._scroll_by(len(rows))
+
+    def _wrap(self, line):
+        """Split a styled line into the rows it takes up on screen."""
+        return markup.wrap(line, Terminal._TEXT_WIDTH, self._font)
 
     def _complete_input(self):
         """Process a line of input from the user."""
         # Add the current line to the buffer
-        self._add_to_buf([self.get_current_line(True)])
+        self._add_to_buf([self.get_current_line(True)], plain=True)
 
         if self._current_program:
             # Handle bad input errors
@@ -204,36 +320,40 @@ class Terminal:
         self._current_line = ""
 
     def _tab_complete(self):
-        # Only works outside programs for now
+        """Complete the word being typed, or list what it could be."""
+        line = self.get_current_line()
         if self._current_program is None:
-            partial = self.get_current_line()
-
-            # Find the command being typed
-            matches = [c for c in list(self._programs.keys()) + ["help"]
-                       if c.startswith(partial)]
-            if len(matches) == 1:
-                self.set_current_line(matches[0])
-            elif len(matches) > 1:
-                # Get the common prefix. If this is more than what is typed
-                # then complete up till that, else display options
-                common_prefix = os.path.commonprefix(matches)
-                if common_prefix != partial:
-                    self.set_current_line(common_prefix)
-                else:
-                    self.output([self.get_current_line(True),
-                                 "  ".join(matches)])
-
-    def _run_reboot(self):
-        """Handle scrolling text as part of a reboot."""
-        if self._rebooting and self._reboot_update_time <= self._timer.time:
-            pause, line = self._reboot_buf.popleft()
+            # Complete the last word, as a command or subcommand name.
+            *words, partial = line.split(" ")
+            common_prefix, matches = self._commands.complete(words, partial)
+        else:
+            # Programs complete the whole line.
+            words, partial = [], line
+            trie = self._current_program.completions
+            if trie is None:
+                return
+            common_prefix, matches = trie.complete(partial)
+
+        if len(matches) == 1:
+            self.set_current_line(" ".join(words + matches))
+        elif len(matches) > 1:
+            # If the common prefix is more than what is typed then complete up
+            # till that, else display options
+            if common_prefix != partial:
+                self.set_current_line(" ".join(words + [common_prefix]))
+            else:
+                self._add_to_buf([self.get_current_line(True),
+                                  "  ".join(matches)], plain=True)
+
+    def _reboot_sequence(self, lines):
+        """Task that outputs (pause, line) tuples, pausing after each line."""
+        *banner, (_, last_line) = lines
+        for pause, line in banner:
             self.output([line])
+            yield pause
 
-            if not self._reboot_buf:
-                self._rebooting = False
-            else:
-                residual = self._timer.time - self._reboot_update_time
-                self._reboot_update_time = self._timer.time + pause - residual
+        self.output([last_line])
+        self._rebooting = False
 
     @property
     def time(self):
@@ -260,19 +380,29 @@ class Terminal:
         # Don't need to add prompt - this gets added by get_current_line()
         self._current_line = line
 
-    def on_keypress(self, key, key_unicode):
-        """Handle a user keypress."""
+    def on_keypress(self, key, key_unicode, mod=0):
+        """
+        Handle a user keypress.
+
+        mod is the modifier key state from the key event. This is used rather
+        than the live keyboard state so that replayed input behaves the same.
+
+        """
         # Ignore all input if in freeze mode, or we are rebooting.
         if self._freeze_time is not None or self._rebooting:
             return
 
+        # While searching the history, keys edit the search instead.
+        if (self._cmd_history.searching and
+                self._cmd_history.on_search_keypress(key, key_unicode, mod)):
+            return
+
         # Any typing other than arrows reset history navigation
         if key not in (pygame.K_UP, pygame.K_DOWN):
             self._cmd_history.reset_navigation()
 
         # Abort whatever is running on ctrl+c
-        if (key == pygame.K_c and
-                pygame.key.get_mods() & pygame.KMOD_CTRL):
+        if key == pygame.K_c and mod & pygame.KMOD_CTRL:
             current_line = self.get_current_line(True)
 
             # If we are in a program, then abort it
@@ -282,6 +412,8 @@ class Terminal:
                     return
 
                 self._current_program.on_abort()
+                self.events.publish(GameEvent.PROGRAM_EXITED,
+                                    self._current_program)
                 self._current_program = None
             self.output([current_line + "^C"])
             self._reset_prompt()
@@ -299,7 +431,12 @@ class Terminal:
         repeat_on_hold = False
         if key in [pygame.K_RETURN, pygame.K_KP_ENTER]:
             if self.get_current_line(True):
+                self._scroll = 0
                 self._complete_input()
+        elif key == pygame.K_PAGEUP:
+            self._scroll_by(Terminal._PAGE_LINES)
+        elif key == pygame.K_PAGEDOWN:
+            self._scroll_by(-Terminal._PAGE_LINES)
         elif key == pygame.K_BACKSPACE:
             self._current_line = self._current_line[:-1]
             repeat_on_hold = True
@@ -307,6 +444,10 @@ class Terminal:
             # Currently not supported in a program
             if self._current_program is None:
                 self._cmd_history.navigate(key == pygame.K_UP)
+        elif key == pygame.K_r and mod & pygame.KMOD_CTRL:
+            # Also not supported in a program
+            if self._current_program is None:
+                self._cmd_history.start_search()
         elif key == pygame.K_TAB:
             self._tab_complete()
         elif key_unicode in Terminal._ACCEPTED_CHARS:
@@ -328,6 +469,26 @@ class Terminal:
         if self._current_program:
             self._current_program.on_mouseclick(button, pos)
 
+        # The mouse wheel scrolls the terminal's own output.
+        if (self._current_program is None or
+                not (self._current_program.PROPERTIES.is_graphical or
+                     self._current_program.PROPERTIES.alternate_buf)):
+            if button == mouse.Button.WHEEL_UP:
+                self._scroll_by(Terminal._WHEEL_LINES)
+            elif button == mouse.Button.WHEEL_DOWN:
+                self._scroll_by(-Terminal._WHEEL_LINES)
+
+    def _scroll_by(self, lines):
+        """Scroll the view back by some lines, or forward if negative."""
+        self._scroll = max(0, min(self._scroll + lines, self._max_scroll()))
+
+    def _max_scroll(self):
+        """Get how far back the view can be scrolled."""
+        # The bottom rows are always the current line's, so the oldest line
+        # stops at the row above them.
+        buf_rows = Terminal._VISIBLE_LINES - self._current_rows
+        return max(0, len(self._buf) - buf_rows) if buf_rows > 0 else 0
+
     def on_mousemove(self, pos):
         """Handle a user mouse move."""
         if self._current_program:
@@ -347,22 +508,23 @@ class Terminal:
         """Freeze terminal for 'time' ms, displaying progress bar."""
         self._freeze_start = self._timer.time
         self._freeze_time = time
+        self.events.publish(GameEvent.FROZEN, time)
 
     def reduce_time(self, time):
         """Reduce the available time by 'time' seconds."""
         self._countdown_timer.update(time * 1000)
+        self.events.publish(GameEvent.TIME_PENALTY, time)
 
     def reboot(self, msg=""):
         """Simulate a reboot."""
-        # Clear the buffer.
+        # Clear the buffer, and stop anything that was still being output.
         self._buf.clear()
-
-        self._rebooting = True
-        self._reboot_update_time = self._timer.time
+        self._scroll = 0
+        self._tasks.clear()
 
         # Display welcome message.
         PAUSE_LEN = 20
-        self._reboot_buf.extend([
+        lines = [
             (PAUSE_LEN, "-" * 60),
             (PAUSE_LEN, "Mainframe terminal"),
             (PAUSE_LEN, ""),
@@ -372,10 +534,10 @@ class Terminal:
             (PAUSE_LEN, ""),
             (PAUSE_LEN,
              "Tip of the day: press ctrl+c to cancel current command."),
-            (PAUSE_LEN, "-" * 60)])
+            (PAUSE_LEN, "-" * 60)]
 
         if msg:
-            self._reboot_buf.extend([
+            lines.extend([
                 (PAUSE_LEN * 25, ""),
                 (PAUSE_LEN * 50, msg)])
 
@@ -390,11 +552,168 @@ class Terminal:
         # Push banner to top, leaving space for end messages, and for
         # current line.
         blank_lines = (Terminal._VISIBLE_LINES -
-                       len(self._reboot_buf) - len(end_msgs) - 1)
-        self._reboot_buf.extend([(PAUSE_LEN, "")] * blank_lines + end_msgs)
+                       len(lines) - len(end_msgs) - 1)
+        lines.extend([(PAUSE_LEN, "")] * blank_lines + end_msgs)
+
+        self._rebooting = True
+        self._reboot_msg = msg
+        self.start_task(self._reboot_sequence(lines))
+
+    def snapshot(self):
+        """
+        Save the state of the game, as bytes that restore() accepts.
+
+        This covers the output and input lines, the text colour, the timers,
+        the programs along with their puzzles, and which programs have been
+        completed. The command history is kept by the shared HistoryStore, so
+        isn't saved.
+
+        """
+        return snapshot.dumps({
+            'id_string': self.id_string,
+            'locked': self.locked,
+            'buf': list(self._buf.window(0, len(self._buf))),
+            'scroll': self._scroll,
+            'current_line': self._current_line,
+            'text_colour': self._text_colour,
+            'timer': self._timer,
+            'countdown_timer': self._countdown_timer,
+            'freeze': (self._freeze_start, self._freeze_time),
+            'reboot_msg': self._reboot_msg if self._rebooting else None,
+            'programs': self._programs,
+            'current_program': self._program_cmds.get(self._current_program),
+            'remaining': self._remaining,
+            'depends': self._depends,
+        })
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """
+        Create a terminal from a snapshot.
+
+        Raises SnapshotError if the snapshot can't be restored.
+
+        """
+        terminal = cls(programs={})
+        terminal.restore(data)
+        return terminal
+
+    def restore(self, data):
+        """
+        Go back to the state saved in a snapshot.
+
+        Raises SnapshotError if the snapshot can't be restored, in which case
+        the terminal is left as it was.
+
+        """
+        state = snapshot.loads(data)
+
+        if state['id_string'] != self.id_string:
+            self.id_string = state['id_string']
+            self._bezel = render_bezel(self.id_string)
+            self._bezel_off = render_bezel(self.id_string, power_off=True)
+
+        self.locked = state['locked']
+        self._buf.clear()
+        for row in reversed(state['buf']):
+            self._buf.append(row)
+        self._scroll = state['scroll']
+        self._current_line = state['current_line']
+        self._text_colour = state['text_colour']
+        self._cmd_history = CommandHistory(self, history.get_store())
+        self._held_key = None
+        self._key_last_repeat = None
+
+        self._timer = state['timer']
+        self._countdown_timer = state['countdown_timer']
+        self._freeze_start, self._freeze_time = state['freeze']
+
+        self._programs = state['programs']
+        for program in self._programs.values():
+            program.attach(self)
+        self._program_cmds = {p: c for c, p in self._programs.items()}
+        self._current_program = self._programs.get(state['current_program'])
+        self._program_buf_key = None
+        self._register_commands()
+
+        # The dependencies are compiled again, and brought up to date with
+        # the programs that have been completed.
+        self._depends = state['depends']
+        self._remaining = set(state['remaining'])
+        self._dependencies = DependencyGraph(
+            {c: self._depends.get(c, []) for c in self._programs})
+        for cmd in self._programs:
+            if cmd not in self._remaining:
+                self._dependencies.complete(cmd)
+
+        # Tasks can't be saved, so a reboot that was part way through is
+        # started again.
+        self._tasks.clear()
+        self._rebooting = False
+        if state['reboot_msg'] is not None:
+            self.reboot(state['reboot_msg'])
+
+        self.invalidate()
+
+    def start_task(self, task):
+        """
+        Start a task that runs alongside the terminal, from now.
+
+        A task is a generator, which yields the number of ms to wait before
+        it's resumed. Tasks are resumed as the terminal runs, catching up on
+        everything that's due, so they can output long runs of lines with
+        pauses that don't depend on the frame rate. Any tasks still running
+        are stopped by a reboot.
+
+        """
+        return self._tasks.start(task, self._timer.time)
 
     def draw(self):
-        """Draw terminal."""
+        """
+        Draw terminal.
+
+        Returns a list of the screen rects that were changed, or None if the
+        whole screen was redrawn.
+
+        """
+        # If the current program is a graphical one, it reports its own
+        # changes, else work out which lines of monitor contents changed.
+        program = self._current_program
+        if program is not None and program.PROPERTIES.is_graphical:
+            rects = program.damage()
+        else:
+            self._rows, self._cursor = self._layout_contents()
+            self._text_layer.update(self._rows[self._current_rows:])
+            rects = self._text_damage()
+
+        if (self._full_redraw or program is not self._drawn_program or
+                rects is None):
+            screen.repaint(None, self._paint)
+            rects = None
+        else:
+            rects.extend(self.bezel_damage())
+            screen.repaint(rects, self._paint)
+
+        self._full_redraw = False
+        self._drawn_program = program
+        self._drawn_rows = self._rows
+        self._drawn_cursor = self._cursor
+
+        # Make sure cursor is an arrow if we are not in a program. This should
+        # be a no-op if it is already an arrow.
+        if self._current_program is None:
+            mouse.current.set_cursor(mouse.Cursor.ARROW)
+
+        return rects
+
+    def invalidate(self):
+        """Forget what is on screen, so that the next draw is a full redraw."""
+        self._full_redraw = True
+
+    def _paint(self):
+        """Paint the whole screen, within the current clip area."""
+        screen.get_surface().fill((0, 0, 0))
+
         # If the current program is a graphical one, draw it now, else draw
         # monitor contents.
         if (self._current_program and
@@ -406,13 +725,16 @@ class Terminal:
             self._draw_contents()
             self.draw_bezel()
 
-        # Make sure cursor is an arrow if we are not in a program. This should
-        # be a no-op if it is already an arrow.
-        if self._current_program is None:
-            mouse.current.set_cursor(mouse.Cursor.ARROW)
+    def _layout_contents(self):
+        """
+        Work out the lines of text to display, and where to draw them.
 
-    def _draw_contents(self):
-        """Draw the terminal."""
+        Returns a list of (styled line, colour, rect) tuples for each row on
+        screen, from the bottom up, and the rect of the cursor along with its
+        fill width, or None if the cursor is not showing. The number of those
+        rows that are the current line's is kept in _current_rows.
+
+        """
         if self._rebooting:
             # If we're rebooting, don't draw the prompt
             current_line = ""
@@ -426,87 +748,174 @@ class Terminal:
             current_line = ("[" +
                             "!" * (self._PROGRESS_BAR_SIZE - remain) +
                             " " * remain + "]")
+        elif self._cmd_history.searching:
+            current_line = self._cmd_history.search_line
         else:
             current_line = self.get_current_line(True)
 
-        # If program has its own buf, then use it
+        # The cursor follows the current line, on its bottom row. The line is
+        # shown as typed, without parsing any markup in it.
+        current_rows = self._wrap(markup.plain(current_line))[::-1]
+        self._current_rows = min(len(current_rows), Terminal._VISIBLE_LINES)
+
+        # The current line may have taken up more rows since the view was
+        # scrolled, leaving less room for the buffer.
+        self._scroll = min(self._scroll, self._max_scroll())
+
+        # If program has its own buf, then use it.
         if (self._current_program is not None and
                 self._current_program.PROPERTIES.alternate_buf):
-            buf = self._current_program.buf
+            buf = self._program_lines()
         else:
-            buf = self._buf
+            buf = self._buf.window(self._scroll, self._VISIBLE_LINES - 1)
 
-        # Draw the buffer.
-        y_coord = Terminal._TEXT_START[1]
-        first_line_height = None
-        for line in list(itertools.chain(
-                [current_line], buf))[:self._VISIBLE_LINES]:
-            # Set defaults before checking whether the line overrides.
-            colour = Terminal._TEXT_COLOUR
-            size = Terminal._TEXT_SIZE
-            fontname = ""
-
-            # Look for any font commands at the start of the line.
-            pattern = re.compile(r'<(. [^>]+?)>')
-            m = pattern.match(line)
-            while m:
-                # Don't display the commands
-                line = line[len(m.group(0)):]
-                cmd, arg = m.group(1).split()
-                if cmd == 'c':
-                    # Change the colour code.
-                    colour = Terminal._TEXT_COLOURS[arg]
-                elif cmd == 's':
-                    size = int(arg)
-                elif cmd == 'f':
-                    # Don't load the font yet, as we need to know which
-                    # size to load, and the size cmd might come after the
-                    # font command
-                    fontname = arg
-
-                m = pattern.match(line)
-
-            if fontname:
-                font = load_font(fontname, size)
-            else:
-                font = self._font
+        # Lines run from the text start to the right of the screen.
+        width = screen.get_surface().get_rect().w - self._TEXT_START[0]
 
+        rows = []
+        y_coord = Terminal._TEXT_START[1]
+        for line in itertools.islice(itertools.chain(current_rows, buf),
+                                     self._VISIBLE_LINES):
             # The height of the rendered text can sometimes be quite different
             # to the 'size' value used. So use the rendered height with a 2
             # pixel padding each side
-            line_height = font.size(line)[1] + 4
-            if first_line_height is None:
-                first_line_height = line_height
-
+            line_height = max((s.font or self._font).get_height()
+                              for s in line.spans) + 4
             y_coord -= line_height
 
-            text = font.render(line, True, colour)
-            pygame.display.get_surface().blit(
-                text, (Terminal._TEXT_START[0], y_coord))
+            # The terminal colour is included, as it changes how any spans
+            # without their own colour look.
+            rows.append((line, self._text_colour,
+                         pygame.Rect(Terminal._TEXT_START[0], y_coord,
+                                     width, line_height)))
 
         # Determine whether the cursor is on.
+        cursor = None
         if ((self._current_program is None or
                 not self._current_program.PROPERTIES.hide_cursor) and
                 not self._rebooting and
                 (self._timer.time % (Terminal._CURSOR_ON_MS +
                                      Terminal._CURSOR_OFF_MS) <
                  Terminal._CURSOR_ON_MS)):
-            first_line_size = self._font.size(current_line)
-            pygame.draw.rect(pygame.display.get_surface(),
-                             Terminal._TEXT_COLOUR,
-                             (Terminal._TEXT_START[0] + first_line_size[0] + 1,
-                              Terminal._TEXT_START[1] - first_line_height - 1,
-                              Terminal._CURSOR_WIDTH, first_line_size[1]),
-                             0 if self._has_focus else 1)
+            cursor = (pygame.Rect(
+                          Terminal._TEXT_START[0] +
+                          self._line_width(rows[0][0]) + 1,
+                          Terminal._TEXT_START[1] - rows[0][2].h - 1,
+                          Terminal._CURSOR_WIDTH, self._font.get_height()),
+                      self._text_colour,
+                      0 if self._has_focus else 1)
+
+        return rows, cursor
+
+    def _program_lines(self):
+        """
+        Get the wrapped rows of the current program's buf.
+
+        Programs generate their buf afresh each time it's read, so it's only
+        read again when the program reports that it has changed.
+
+        """
+        program = self._current_program
+        key = (program, program.buf_version)
+        if key[1] is None or key != self._program_buf_key:
+            # The buf runs from the newest line up, so each line's rows are
+            # taken bottom first.
+            rows = itertools.chain.from_iterable(
+                reversed(self._wrap(markup.parse(l))) for l in program.buf)
+            self._program_buf = list(
+                itertools.islice(rows, Terminal._VISIBLE_LINES - 1))
+            self._program_buf_key = key
+        return self._program_buf
+
+    def _text_damage(self):
+        """Find the screen rects that changed since the text was drawn."""
+        rects = []
+        for old, new in itertools.zip_longest(self._drawn_rows, self._rows):
+            if old != new:
+                rects.extend(r[2] for r in (old, new) if r is not None)
+
+        # The changed lines are stacked vertically, so just cover them with a
+        # single rect.
+        if rects:
+            rects = [rects[0].unionall(rects[1:])]
+
+        if self._cursor != self._drawn_cursor:
+            rects.extend(c[0] for c in (self._cursor, self._drawn_cursor)
+                         if c is not None)
+
+        return rects
+
+    def _draw_contents(self):
+        """Draw the terminal."""
+        surface = screen.get_surface()
+
+        # The output lines are already drawn on the text layer, which sits
+        # on top of the current line's rows. Those change as the line is
+        # typed, so are drawn afresh along with the cursor.
+        current_rows = self._rows[:self._current_rows]
+        top = current_rows[-1][2]
+        layer = self._text_layer.surface
+        screen.compose(layer, (top.x, top.y - layer.get_height()))
+
+        for line, colour, rect in current_rows:
+            if surface.get_clip().colliderect(rect):
+                self._draw_line(surface, line, colour, rect.topleft)
+
+        # The cursor overlaps the text layer, so is composed over it.
+        if self._cursor is not None:
+            rect, colour, width = self._cursor
+            screen.compose(self._cursor_image(rect.size, colour, width), rect)
+
+    @staticmethod
+    def _cursor_image(size, colour, width):
+        """Get the image of the cursor, drawing it the first time."""
+        key = (size, colour, width)
+        if key not in Terminal._cursors:
+            image = screen.make_surface(size, alpha=True)
+            image.fill((0, 0, 0, 0))
+            pygame.draw.rect(image, colour, image.get_rect(), width)
+            Terminal._cursors[key] = image
+        return Terminal._cursors[key]
+
+    def _draw_line(self, surface, line, default_colour, pos):
+        """Draw a styled line onto a surface."""
+        x_coord, y_coord = pos
+        for span in line.spans:
+            colour = span.colour or default_colour
+            if span.font is None:
+                # Spans in the terminal font are drawn from its glyph atlas.
+                atlas = self._text_atlas(colour)
+                atlas.draw(surface, span.text, (x_coord, y_coord))
+                x_coord += atlas.size(span.text)[0]
+            else:
+                text = span.font.render(span.text, True, colour)
+                surface.blit(text, (x_coord, y_coord))
+                x_coord += text.get_width()
+
+    def _line_width(self, line):
+        """Get the width of a styled line."""
+        return sum(self._text_atlas(self._text_colour).size(s.text)[0]
+                   if s.font is None else s.font.size(s.text)[0]
+                   for s in line.spans)
+
+    @staticmethod
+    def _text_atlas(colour):
+        """Get the glyph atlas for the terminal font in a given colour."""
+        return glyphs.load_atlas(Terminal._TEXT_FONT, Terminal._TEXT_SIZE,
+                                 colour)
 
     def draw_bezel(self, power_off=False):
         """Draw the bezel."""
         bezel = self._bezel if not power_off else self._bezel_off
-        pygame.display.get_surface().blit(bezel, bezel.get_rect())
+        bezel.draw()
 
         # Draw the countdown text.
         self._countdown_timer.draw(Terminal._TIMER_POS)
 
+    def bezel_damage(self):
+        """Return the rects of the bezel that changed since it was drawn."""
+        return self._countdown_timer.damage(Terminal._TIMER_POS)
+
     def run(self):
         """Run terminal logic."""
         self._timer.update()
@@ -514,16 +923,21 @@ class Terminal:
         if self.paused:
             return
 
-        # Run the reboot if one is in progress.
-        self._run_reboot()
+        # Run any tasks that are due, such as the reboot banner.
+        self._tasks.run(self._timer.time)
 
         # Check whether the current program (if there is one) has exited.
         if self._current_program and self._current_program.exited():
             # If it exited because it was successfully completed, then display
             # syslog, unless the program is going to do it itself
-            if (self._current_program.completed() and
-                    not self._current_program.PROPERTIES.suppress_success):
-                self.output([self._current_program.success_syslog])
+            if self._current_program.completed():
+                if not self._current_program.PROPERTIES.suppress_success:
+                    self.output([self._current_program.success_syslog])
+                self.events.publish(GameEvent.PROGRAM_COMPLETED,
+                                    self._current_program)
+            else:
+                self.events.publish(GameEvent.PROGRAM_EXITED,
+                                    self._current_program)
 
             self._current_program = None
 
@@ -532,8 +946,9 @@ class Terminal:
 
         # Check if the player ran out of time.
         self._countdown_timer.update(self._timer.frametime)
-        if self._countdown_timer.ended:
+        if self._countdown_timer.ended and not self.locked:
             self.locked = True
+            self.events.publish(GameEvent.LOCKED)
 
         # See whether terminal can be unfrozen
         if (self._freeze_time is not None and
@@ -560,10 +975,22 @@ class Terminal:
         if self._current_program is not None:
             self._current_program.run()
 
+    @property
+    def current_program(self):
+        """Get the program that is running, or None."""
+        return self._current_program
+
+    @property
+    def busy(self):
+        """Indicate whether the terminal is animating, or running a program."""
+        return (len(self._tasks) > 0 or
+                self._freeze_time is not None or
+                self._held_key is not None or
+                self._current_program is not None)
+
     def completed(self):
         """Indicate whether the player has been successful."""
-        return len([p for p in self._programs.values()
-                    if not p.completed()]) == 0
+        return not self._remaining
 
     @property
     def paused(self):
@@ -578,20 +1005,38 @@ class Terminal:
 
 class CommandHistory:
 
-    """Class for storing and navigating a terminal's command history."""
+    """
+    Class for navigating and searching a terminal's command history.
 
-    def __init__(self, terminal, maxlen):
+    The commands are kept in a HistoryStore, which is shared with the other
+    terminals.
+
+    """
+
+    _SEARCH_PROMPT = "(reverse-i-search)'{}': {}"
+
+    def __init__(self, terminal, store):
         """Intialize the class."""
         self._terminal = terminal
-        self._history = deque(maxlen=maxlen)
+        self._store = store
         self._pos = -1
         self._saved_line = None
 
+        # While searching, the query typed so far, a list with the indices of
+        # the commands matching each prefix of the query, and how many
+        # matches back from the newest the shown match is. The query is None
+        # when not searching.
+        self._query = None
+        self._matches = []
+        self._match = 0
+
+        # The store's trim count when the matches were found.
+        self._trims = 0
+
     def add_command(self, cmd):
         """Add a command to the command history."""
-        # Skip repeated commands
-        if len(self._history) == 0 or self._history[0] != cmd:
-            self._history.appendleft(cmd)
+        # The store skips repeated commands
+        self._store.add(cmd)
 
     def reset_navigation(self):
         """Reset the position in the command history."""
@@ -599,23 +1044,174 @@ class CommandHistory:
 
     def navigate(self, up):
         """Navigate through the command history."""
+        history = self._store.commands
         if up:
-            if self._pos + 1 < len(self._history):
+            if self._pos + 1 < len(history):
                 # If we are starting a history navigation, then save current
                 # line
                 if self._pos == -1:
                     self._saved_line = self._terminal.get_current_line()
                 self._pos += 1
-                self._terminal.set_current_line(self._history[self._pos])
+                self._terminal.set_current_line(history[-1 - self._pos])
         else:
             if self._pos > 0:
                 self._pos -= 1
-                self._terminal.set_current_line(self._history[self._pos])
+                self._terminal.set_current_line(history[-1 - self._pos])
             elif self._pos == 0:
                 # Restore saved line
                 self._pos = -1
                 self._terminal.set_current_line(self._saved_line)
 
+    @property
+    def searching(self):
+        """Indicate whether a reverse search is in progress."""
+        return self._query is not None
+
+    @property
+    def search_line(self):
+        """Get the line to show in place of the prompt while searching."""
+        self._check_trimmed()
+        return CommandHistory._SEARCH_PROMPT.format(self._query,
+                                                    self._found() or "")
+
+    def start_search(self):
+        """Start a reverse incremental search through the history."""
+        self._saved_line = self._terminal.get_current_line()
+        self._query = ""
+        self._matches = [self._store.search(self._query)]
+        self._match = 0
+        self._trims = self._store.trims
+
+    def on_search_keypress(self, key, key_unicode, mod):
+        """
+        Handle a keypress while searching.
+
+        Returns True if the key was used by the search. Otherwise the search
+        has ended, leaving the match as the current line, and the key should
+        be handled as usual.
+
+        """
+        self._check_trimmed()
+        if key == pygame.K_r and mod & pygame.KMOD_CTRL:
+            # Move on to the next older match.
+            if self._match + 1 < len(self._matches[-1]):
+                self._match += 1
+        elif key == pygame.K_BACKSPACE:
+            if self._query:
+                self._query = self._query[:-1]
+                self._matches.pop()
+                self._match = 0
+        elif (key == pygame.K_ESCAPE or
+              (key in (pygame.K_c, pygame.K_g) and mod & pygame.KMOD_CTRL)):
+            # Cancel the search, going back to what was typed before.
+            self._end_search(self._saved_line)
+        elif key_unicode and key_unicode in Terminal._ACCEPTED_CHARS:
+            # Each new character narrows down the previous matches.
+            self._query += key_unicode
+            self._matches.append(self._store.search(self._query,
+                                                    self._matches[-1]))
+            self._match = 0
+        else:
+            found = self._found()
+            self._end_search(self._saved_line if found is None else found)
+            return False
+
+        return True
+
+    def _check_trimmed(self):
+        """Search again if the store has been trimmed since the last search."""
+        # Trimming renumbers the commands, e.g. when another terminal adds a
+        # command, so the matches are found again for each prefix.
+        if self._trims == self._store.trims:
+            return
+
+        self._trims = self._store.trims
+        self._matches = [self._store.search("")]
+        for end in range(1, len(self._query) + 1):
+            self._matches.append(self._store.search(self._query[:end],
+                                                    self._matches[-1]))
+        self._match = min(self._match, max(0, len(self._matches[-1]) - 1))
+
+    def _found(self):
+        """Get the command the search has found, or None."""
+        matches = self._matches[-1]
+        if self._match < len(matches):
+            return self._store.commands[matches[-1 - self._match]]
+        return None
+
+    def _end_search(self, line):
+        """Stop searching, and set the current line."""
+        self._query = None
+        self._matches = []
+        self._terminal.set_current_line(line)
+
+
+class TextLayer:
+
+    """
+    Offscreen copy of the terminal's output lines, newest at the bottom.
+
+    When new lines are output, the existing pixels are scrolled up with a
+    single blit and only the new lines are drawn. The layer is only redrawn
+    from scratch when the lines change some other way, e.g. after a reboot, a
+    colour change, scrolling back, or a program showing its own output.
+
+    """
+
+    def __init__(self, size, draw_line):
+        """Initialize the class."""
+        self.surface = screen.make_layer(size)
+        self.surface.fill((0, 0, 0))
+        self._draw_line = draw_line
+
+        # The (line, colour, height) of each line on the layer, newest first.
+        self._lines = ()
+
+    def update(self, rows):
+        """Bring the layer up to date with rows of (line, colour, rect)."""
+        lines = tuple((line, colour, rect.h) for line, colour, rect in rows)
+        if lines == self._lines:
+            return
+
+        width, height = self.surface.get_size()
+        added = self._count_added(lines)
+        if added is None:
+            self.surface.fill((0, 0, 0))
+            self._draw_lines(lines)
+        else:
+            shift = sum(h for _, _, h in lines[:added])
+            self.surface.scroll(0, -shift)
+            self.surface.fill((0, 0, 0), (0, height - shift, width, shift))
+            self._draw_lines(lines[:added])
+
+        # Clear anything scrolled above the oldest line.
+        used = sum(h for _, _, h in lines)
+        if used < height:
+            self.surface.fill((0, 0, 0), (0, 0, width, height - used))
+
+        self._lines = lines
+
+    def _count_added(self, lines):
+        """
+        Count the new lines, if the old ones are just pushed up by them.
+
+        This can be 0, when the oldest lines have been dropped because the
+        current line has taken up more rows. Returns None if the lines have
+        changed in any other way.
+
+        """
+        for count in range(len(lines)):
+            if lines[count:] == self._lines[:len(lines) - count]:
+                return count
+        return None
+
+    def _draw_lines(self, lines):
+        """Draw lines from the bottom of the layer up."""
+        y_coord = self.surface.get_height()
+        for line, colour, line_height in lines:
+            y_coord -= line_height
+            self._draw_line(self.surface, line, colour, (0, y_coord))
+
 
 class CountdownTimer:
 
@@ -627,6 +1223,15 @@ class CountdownTimer:
     _FLASH_TIME = 3000
     _FLASH_ON = 600
     _FLASH_OFF = 400
+    _GLYPH_CHARS = '0123456789:'
+
+    # For each font, a dict mapping each character the timer shows to its
+    # glyph, and where the glyph goes relative to the character's pen
+    # position. These are shared by every timer.
+    _glyphs = {}
+
+    # Semi transparent backdrops for the timer, by size.
+    _backdrops = {}
 
     """Class for the terminal countdown timer."""
     def __init__(self, time_in_s, warning_secs):
@@ -643,6 +1248,23 @@ class CountdownTimer:
         # The times at which the timer should be large and flashing!
         self._flash_times = [warning_secs, 15, 5, 4, 3, 2, 1]
 
+        # What was displayed when the timer was last drawn, and where, and the
+        # text composed for it.
+        self._drawn = None
+        self._drawn_rect = None
+        self._sprite = None
+
+        for font in (self._timer_font, self._timer_large_font):
+            if font not in CountdownTimer._glyphs:
+                CountdownTimer._glyphs[font] = self._render_glyphs(font)
+
+    def __getstate__(self):
+        """Get the state to save in a snapshot."""
+        # What's on screen isn't saved, so the timer is drawn afresh.
+        state = self.__dict__.copy()
+        state.update(_drawn=None, _drawn_rect=None, _sprite=None)
+        return state
+
     @property
     def secs_left(self):
         return self._timeleft // 1000
@@ -673,28 +1295,103 @@ class CountdownTimer:
                         self.secs_left <= self._flash_times[0]):
                     self._flash_times = self._flash_times[1:]
 
-    def draw(self, pos):
+    def _display(self):
+        """
+        Return the (text, colour, font) for the timer as currently displayed.
+
+        Returns None if the timer is hidden.
+
+        """
         # If we are flashing the text, then skip draw if we are in an 'off'
         if (self._flash_start is not None and
                 self._timeleft % (self._FLASH_ON + self._FLASH_OFF)
                 < self._FLASH_OFF):
-            return
+            return None
 
         # Are we using normal font or the large flashing font?
-        font = self._timer_font
-        if self._flash_start is not None:
-            font = self._timer_large_font
+        font = self._get_font()
 
-        # Draw the countdown text on a semi transparent background
         colour = CountdownTimer._TIMER_COLOUR
         if self.secs_left <= self._warning_secs:
             colour = CountdownTimer._TIMER_WARNING_COLOUR
         minutes, seconds = divmod(self.secs_left, 60)
-        text = font.render('{}:{:02}'.format(minutes, seconds), True, colour)
-        surf = pygame.Surface((text.get_rect().w + 4, text.get_rect().h))
-        surf.set_alpha(100)
-        pygame.display.get_surface().blit(surf, pos)
-        pygame.display.get_surface().blit(text, (pos[0] + 2, pos[1]))
+        return '{}:{:02}'.format(minutes, seconds), colour, font
+
+    @staticmethod
+    def _rect(display, pos):
+        """Get the screen rect covered by a given timer display."""
+        if display is None:
+            return None
+
+        text, _, font = display
+        w, h = font.size(text)
+        return pygame.Rect(pos, (w + 4, h))
+
+    def damage(self, pos):
+        """Return the screen rects that changed since the timer was drawn."""
+        display = self._display()
+        if display == self._drawn:
+            return []
+
+        return [r for r in (self._drawn_rect, self._rect(display, pos))
+                if r is not None]
+
+    def draw(self, pos):
+        display = self._display()
+        self._drawn = display
+        self._drawn_rect = self._rect(display, pos)
+        if display is None:
+            return
+
+        # Only compose the text when what's displayed changes - which is at
+        # most once a second, or when the timer starts or stops flashing.
+        if self._sprite is None or self._sprite[0] != display:
+            self._sprite = display, self._compose(*display)
+
+        # Draw the countdown text on a semi transparent background
+        text = self._sprite[1]
+        size = self._drawn_rect.size
+        backdrop = CountdownTimer._backdrops.get(size)
+        if backdrop is None:
+            backdrop = screen.make_surface(size)
+            backdrop.set_alpha(100, pygame.RLEACCEL)
+            CountdownTimer._backdrops[size] = backdrop
+        screen.compose(backdrop, pos)
+        screen.compose(text, (pos[0] + 2, pos[1]))
+
+    @staticmethod
+    def _render_glyphs(font):
+        """Render the glyphs for the characters the timer shows."""
+        glyphs = {}
+        for char in CountdownTimer._GLYPH_CHARS:
+            # Keep just the glyph's coverage in its alpha, so glyphs can be
+            # added together and coloured by the surface they're added to.
+            glyph = font.render(char, True, (255, 255, 255)).convert_alpha()
+            glyph.fill((0, 0, 0, 255), special_flags=pygame.BLEND_RGBA_MULT)
+
+            # Like the font renderer, only move glyphs that start left of
+            # their pen position.
+            min_x, _, _, _, advance = font.metrics(char)[0]
+            glyphs[char] = glyph, min(min_x, 0), advance
+        return glyphs
+
+    @staticmethod
+    def _compose(text, colour, font):
+        """Compose the text for a timer display from its glyphs."""
+        glyphs = CountdownTimer._glyphs[font]
+        places = []
+        pen = 0
+        for char in text:
+            glyph, offset, advance = glyphs[char]
+            places.append((glyph, pen + offset))
+            pen += advance
+        left = min(x for _, x in places)
+
+        sprite = screen.make_surface(font.size(text), alpha=True)
+        sprite.fill(colour + (0,))
+        sprite.blits([(glyph, (x - left, 0), None, pygame.BLEND_RGBA_ADD)
+                      for glyph, x in places], doreturn=False)
+        return sprite
 
     def _get_font(self):
         if self._flash_start is not None:
@@ -2,6 +2,21 @@
 
 import pygame
 
+# The simulation clock, in ms. Timers follow this rather than the wall clock,
+# so game time only moves on when the game loop steps the simulation.
+_ticks = 0
+
+
+def get_ticks():
+    """Get the current simulation time, in ms."""
+    return _ticks
+
+
+def advance(ms):
+    """Move the simulation clock forward."""
+    global _ticks
+    _ticks += ms
+
 
 class Timer:
 
@@ -13,17 +28,66 @@ class Timer:
 
     def reset(self):
         """Reset the timer."""
-        self._lasttime = pygame.time.get_ticks()
+        self._lasttime = get_ticks()
         self.paused = False
         self.time = 0
         self.frametime = 0
 
+    def __getstate__(self):
+        """Get the state to save in a snapshot."""
+        # The time of the last update is only meaningful to this run of the
+        # simulation clock.
+        state = self.__dict__.copy()
+        del state['_lasttime']
+        return state
+
+    def __setstate__(self, state):
+        """Restore the timer from a snapshot, carrying on from now."""
+        self.__dict__.update(state)
+        self._lasttime = get_ticks()
+
     def update(self):
         """Update the time values based on the current tickcount."""
-        time = pygame.time.get_ticks()
+        time = get_ticks()
 
         if not self.paused:
             self.frametime = time - self._lasttime
             self.time += self.frametime
 
         self._lasttime = time
+
+
+class FixedStep:
+
+    """
+    Class to convert elapsed real time into fixed simulation steps.
+
+    Real time accumulates between calls, and is paid out in whole steps. If
+    the game falls too far behind, for example because the window was being
+    dragged, the backlog is dropped rather than trying to catch up with an
+    ever increasing number of steps.
+
+    """
+
+    def __init__(self, step_ms, max_steps, speed=1):
+        """Initialize the class."""
+        self.step_ms = step_ms
+        self._max_steps = max_steps
+        self._speed = speed
+        self._accumulated = 0
+        self._lasttime = pygame.time.get_ticks()
+
+    def steps_due(self):
+        """Get the number of simulation steps to run this frame."""
+        time = pygame.time.get_ticks()
+        self._accumulated += (time - self._lasttime) * self._speed
+        self._lasttime = time
+
+        steps = int(self._accumulated // self.step_ms)
+        if steps > self._max_steps:
+            steps = self._max_steps
+            self._accumulated = 0
+        else:
+            self._accumulated -= steps * self.step_ms
+
+        return steps
@@ -0,0 +1,67 @@
+"""
+Benchmark blits of surfaces in the display format against other formats.
+
+Compares the surfaces the game used to create - 24-bit, with alpha applied
+without RLE acceleration - with those from screen.make_surface(). Run from
+the top-level directory with PYTHONPATH=. so that the game modules can be
+imported.
+"""
+import timeit
+import pygame
+import screen
+
+_BLITS = 2000
+_SIZES = {'square': (30, 30), 'background': (400, 300)}
+
+
+def time_blits(target, source):
+    """Get the time, in microseconds, of a single blit."""
+    secs = min(timeit.repeat(lambda: target.blit(source, (10, 10)),
+                             number=_BLITS, repeat=5))
+    return secs / _BLITS * 1000000
+
+
+def old_surface(size, alpha=None):
+    """Create a surface the way the game used to."""
+    surface = pygame.Surface(size, 0, 24)
+    surface.fill((180, 180, 180))
+    if alpha is not None:
+        surface.set_alpha(alpha)
+    return surface
+
+
+def new_surface(size, alpha=None):
+    """Create a surface with the surface factory."""
+    surface = screen.make_surface(size)
+    surface.fill((180, 180, 180))
+    if alpha is not None:
+        surface.set_alpha(alpha, pygame.RLEACCEL)
+    return surface
+
+
+def main():
+    """Run the benchmark."""
+    screen.init([800, 600], headless=True)
+    old_target = pygame.Surface([800, 600], 0, 24)
+    new_target = screen.get_surface()
+
+    print('{:24} {:>10} {:>10} {:>8}'.format('blit', 'old (us)', 'new (us)',
+                                             'speedup'))
+    for name, size in sorted(_SIZES.items()):
+        for alpha in (None, 100):
+            label = '{}{}'.format(name, ' alpha' if alpha else '')
+            old = time_blits(old_target, old_surface(size, alpha))
+            new = time_blits(new_target, new_surface(size, alpha))
+            print('{:24} {:10.2f} {:10.2f} {:7.1f}x'.format(label, old, new,
+                                                           old / new))
+
+        # The old and new surfaces blitted onto the new 32-bit display.
+        label = '{} onto 32-bit'.format(name)
+        old = time_blits(new_target, old_surface(size))
+        new = time_blits(new_target, new_surface(size))
+        print('{:24} {:10.2f} {:10.2f} {:7.1f}x'.format(label, old, new,
+                                                       old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""A test tool to check the terminal's commands work as they always have."""
+import screen
+from commands import Command
+from programs import HardwareInspect, PasswordGuess
+from programs.program import TerminalProgram
+from terminal import Terminal
+
+
+class _StatusProgram(TerminalProgram):
+
+    """A program with a subcommand, which reports that it was run."""
+
+    @property
+    def subcommands(self):
+        """Return the commands that can follow the program's name."""
+        return [Command('status', self._show_status)]
+
+    def _show_status(self):
+        """Show that the subcommand was run."""
+        self._terminal.output(['Status OK'])
+
+
+def _last_line(terminal):
+    """Get the text of the newest line of output."""
+    return ''.join(s.text for s in next(terminal._buf.window(0, 1)).spans)
+
+
+def _run(terminal, cmd):
+    """Type a command, returning the newest line of output."""
+    terminal._process_command(cmd)
+    return _last_line(terminal)
+
+
+def test_builtin_commands():
+    """Check the built-in commands give the same messages as before."""
+    screen.init((800, 600), headless=True)
+    terminal = Terminal(programs={'login': PasswordGuess})
+    terminal.output(['-'])
+    assert _run(terminal, 'login now') == "Unknown command 'login now'."
+    assert _run(terminal, 'help me') == "Unknown command 'help me'."
+    assert _run(terminal, 'colour') == "Unknown command 'colour'."
+    assert _run(terminal, 'freeze') == "Unknown command 'freeze'."
+
+    terminal.output(['-'])
+    assert _run(terminal, 'colour 1 2') == '-'
+    assert _run(terminal, 'colour 1 2 x').startswith('I am not familiar')
+    assert _run(terminal, 'colour 0 255 0') == 'Enjoy your new colour!'
+    assert _run(terminal, 'freeze x') == 'Invalid time'
+
+    # help only lists the programs, but is still completed.
+    terminal._process_command('help')
+    assert _last_line(terminal).split()[0] == 'login'
+    terminal.set_current_line('he')
+    terminal._tab_complete()
+    assert terminal.get_current_line() == 'help'
+
+
+def test_subcommand():
+    """Check that a subcommand runs without starting its program."""
+    screen.init((800, 600), headless=True)
+    terminal = Terminal(programs={'prog': _StatusProgram})
+    assert _run(terminal, 'prog status') == 'Status OK'
+    assert terminal._current_program is None
+
+
+def test_blocked_subcommand():
+    """Check that a subcommand is blocked by its program's dependencies."""
+    screen.init((800, 600), headless=True)
+    terminal = Terminal(programs={'prog': _StatusProgram,
+                                  'hw': HardwareInspect},
+                        depends={'prog': ['hw']})
+    assert _run(terminal, 'prog status').startswith('prog currently blocked')
+
+    terminal._on_program_completed(terminal._programs['hw'])
+    assert _run(terminal, 'prog status') == 'Status OK'
+
+
+if __name__ == '__main__':
+    test_builtin_commands()
+    test_subcommand()
+    test_blocked_subcommand()
+    print('Commands OK')
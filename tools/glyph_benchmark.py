@@ -0,0 +1,91 @@
+"""
+Benchmark drawing terminal lines with Font.render against the glyph atlas.
+
+The lines are drawn in the order the terminal draws them: the current line
+after each key typed, then each line of the command's output once, as the
+text layer only draws lines when they're output.
+
+Run from the top-level directory with PYTHONPATH=. so that the game modules
+can be imported.
+"""
+import random
+import string
+import timeit
+import constants
+import glyphs
+import screen
+from resources import load_font
+
+_COMMANDS = 20
+_COMMAND_LENGTH = 20
+_OUTPUT_LINES = 5
+_LINE_LENGTH = 60
+_REPEATS = 20
+
+
+def random_line(length):
+    """Get a line of random printable characters."""
+    chars = string.ascii_letters + string.digits + string.punctuation + ' '
+    return ''.join(random.choice(chars) for _ in range(length))
+
+
+def draw_sequence():
+    """Get the lines the terminal draws while running some commands."""
+    lines = []
+    for _ in range(_COMMANDS):
+        cmd = '$ ' + random_line(_COMMAND_LENGTH)
+        lines.extend(cmd[:end] for end in range(3, len(cmd) + 1))
+        lines.extend(random_line(_LINE_LENGTH) for _ in range(_OUTPUT_LINES))
+    return lines
+
+
+def lines_per_sec(draw, make_lines):
+    """Get the number of lines a draw function can draw each second."""
+    # Each repeat draws new lines, so that none are drawn from the atlas's
+    # cache of earlier runs.
+    runs = [make_lines() for _ in range(_REPEATS * 5)]
+    count = len(runs[0])
+
+    def run():
+        for i, line in enumerate(runs.pop()):
+            draw(line, (45, 10 + 17 * (i % 29)))
+
+    secs = min(timeit.repeat(run, number=_REPEATS, repeat=5))
+    return count * _REPEATS / secs
+
+
+def main():
+    """Run the benchmark."""
+    screen.init([800, 600], headless=True)
+    surface = screen.get_surface()
+    font = load_font(constants.TERMINAL_FONT, constants.TERMINAL_TEXT_SIZE)
+    atlas = glyphs.load_atlas(constants.TERMINAL_FONT,
+                              constants.TERMINAL_TEXT_SIZE,
+                              constants.TEXT_COLOUR)
+
+    def render(line, pos):
+        surface.blit(font.render(line, True, constants.TEXT_COLOUR), pos)
+
+    def atlas_draw(line, pos):
+        atlas.draw(surface, line, pos)
+
+    # The terminal's own sequence, which hardly ever draws a line twice, and
+    # the same lines drawn again, as when the cursor blinks.
+    lines = draw_sequence()
+    for name, make_lines in (('Terminal sequence', draw_sequence),
+                             ('Repeated lines', lambda: lines)):
+        old = lines_per_sec(render, make_lines)
+        new = lines_per_sec(atlas_draw, make_lines)
+        print('{}: Font.render {:.0f} lines/s, atlas {:.0f} lines/s '
+              '({:.1f}x)'.format(name, old, new, new / old))
+
+    old = min(timeit.repeat(lambda: [font.size(l) for l in lines],
+                            number=_REPEATS, repeat=5))
+    new = min(timeit.repeat(lambda: [atlas.size(l) for l in lines],
+                            number=_REPEATS, repeat=5))
+    print('Font.size: {:.0f} lines/s, atlas advances: {:.0f} lines/s'.format(
+        len(lines) * _REPEATS / old, len(lines) * _REPEATS / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""A test tool to check history searches survive the history being trimmed."""
+import pygame
+
+import screen
+from history import HistoryStore
+from terminal import CommandHistory, Terminal
+
+
+def test_search_after_trim():
+    """Check a search finds the right commands after another adds some."""
+    screen.init((800, 600), headless=True)
+    store = HistoryStore()
+    for idx in range(HistoryStore._MAX_COMMANDS * 2 - 1):
+        store.add('cmd {}'.format(idx))
+
+    terminal = Terminal(programs={})
+    searcher = CommandHistory(terminal, store)
+    searcher.start_search()
+    searcher.on_search_keypress(None, '1', 0)
+    assert searcher.search_line.endswith('cmd 1998')
+
+    # Another terminal's commands make the store drop its oldest commands.
+    other = CommandHistory(terminal, store)
+    other.add_command('cmd 1999')
+    other.add_command('cmd 2000')
+    assert len(store.commands) == HistoryStore._MAX_COMMANDS
+
+    assert searcher.search_line.endswith('cmd 1999')
+    searcher.on_search_keypress(pygame.K_r, '', pygame.KMOD_CTRL)
+    assert searcher.search_line.endswith('cmd 1998')
+
+
+if __name__ == '__main__':
+    test_search_after_trim()
+    print('History OK')
@@ -0,0 +1,39 @@
+"""A test tool to check the terminal's scrollback reaches its oldest line."""
+import pygame
+
+import screen
+from terminal import Terminal
+
+
+def _top_row(terminal):
+    """Draw the terminal, and get the text of its top row on screen."""
+    terminal.draw()
+    return ''.join(s.text for s in terminal._rows[-1][0].spans)
+
+
+def test_page_to_top_with_wrapped_line():
+    """Check paging up reaches the oldest line while a long line is typed."""
+    screen.init((800, 600), headless=True)
+    terminal = Terminal(programs={})
+
+    # Skip the boot messages, so only the lines output here are in the buf.
+    terminal._tasks.clear()
+    terminal._rebooting = False
+    terminal._buf.clear()
+    terminal.output(['line {}'.format(idx) for idx in range(100)])
+
+    terminal.set_current_line('word ' * 100)
+    assert _top_row(terminal) != 'line 0'
+    assert terminal._current_rows > 1
+
+    for _ in range(10):
+        terminal.on_keypress(pygame.K_PAGEUP, '')
+        _top_row(terminal)
+    assert _top_row(terminal) == 'line 0'
+
+    # The line taking up fewer rows leaves room for more of the buf.
+    terminal.set_current_line('')
+    _top_row(terminal)
+    for _ in range(10):
+        terminal.on_keypress(pygame.K_PAGEUP, '')
+    assert _top_row(terminal) == 'line 0'
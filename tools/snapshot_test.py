@@ -0,0 +1,103 @@
+"""A test tool to check snapshots restore, and refuse to run other code."""
+import os
+import pickle
+import tempfile
+
+import screen
+import snapshot
+from programs import HardwareInspect, MineHunt, PasswordGuess
+from terminal import Terminal
+
+
+def _short_str(s):
+    """Create the pickle opcode for a short string."""
+    return b'\x8c' + bytes([len(s)]) + s.encode()
+
+
+def _global_call(module, name, arg):
+    """Create a pickle that calls module.name(arg) when it's loaded."""
+    return (b'\x80\x04' + _short_str(module) + _short_str(name) +
+            pickle.STACK_GLOBAL + _short_str(arg) + pickle.TUPLE1 +
+            pickle.REDUCE + pickle.STOP)
+
+
+def _media(key):
+    """Create a pickle of the media saved by a given pickled key."""
+    return b'\x80\x04' + key + pickle.BINPERSID + pickle.STOP
+
+
+def test_malicious_payloads():
+    """Check that snapshots can't reach anything but the game's classes."""
+    marker = os.path.join(tempfile.mkdtemp(), 'pwned')
+    payloads = [
+        # Reaching os through a module that a game module imports.
+        ('terminal', 'random._os.system'),
+        ('programs', 'random._os.system'),
+        # Modules and functions in game modules, rather than classes.
+        ('terminal', 'random'),
+        ('terminal', 'render_bezel'),
+        # Attributes of game classes that aren't classes defined with them.
+        ('programs.minehunt', 'Puzzle.__init__.__globals__'),
+        ('programs.minehunt', 'Puzzle.__class__'),
+        # Modules that aren't the game's at all.
+        ('os', 'system'),
+        ('builtins', 'eval'),
+    ]
+    for module, name in payloads:
+        try:
+            snapshot.loads(_global_call(module, name, 'touch ' + marker))
+        except snapshot.SnapshotError:
+            pass
+        else:
+            raise AssertionError('Loaded {}.{}'.format(module, name))
+        assert not os.path.exists(marker), '{}.{} ran'.format(module, name)
+
+
+def test_corrupt_snapshots():
+    """Check that corrupt snapshots raise SnapshotError, and nothing else."""
+    screen.init((800, 600), headless=True)
+    snapshots = [
+        # Media that doesn't exist, or isn't an image or a font.
+        _media(_short_str('media/missing.png')),
+        _media(_short_str('snapshot.py')),
+        _media(_short_str('media/fonts/whitrabt.ttf') +
+               _short_str('big') + pickle.TUPLE2),
+        _media(b'K\x01'),
+        # A value that isn't one of an enum's.
+        _global_call('programs.minehunt', 'Puzzle.Time', 'never'),
+    ]
+    for data in snapshots:
+        try:
+            snapshot.loads(data)
+        except snapshot.SnapshotError:
+            pass
+        else:
+            raise AssertionError('Loaded {!r}'.format(data))
+
+
+def test_round_trip():
+    """Check that a terminal is restored from its snapshot."""
+    screen.init((800, 600), headless=True)
+    terminal = Terminal(programs={'login': PasswordGuess,
+                                  'hw': HardwareInspect,
+                                  'mine': MineHunt},
+                        time=300)
+    for program in terminal._programs.values():
+        program.start()
+    terminal._set_colour(0, 255, 0)
+
+    restored = Terminal.from_snapshot(terminal.snapshot())
+    assert restored.id_string == terminal.id_string
+    assert sorted(restored._programs) == sorted(terminal._programs)
+    assert restored._remaining == terminal._remaining
+    assert restored._text_colour == (0, 255, 0)
+
+    # The colour is only changed for the terminal it was set on.
+    assert Terminal(programs={})._text_colour != (0, 255, 0)
+
+
+if __name__ == '__main__':
+    test_malicious_payloads()
+    test_corrupt_snapshots()
+    test_round_trip()
+    print('Snapshots OK')
@@ -2,8 +2,13 @@
 
 
 import pygame
+
+import screen
 from resources import load_image, load_font
 
+# A dict mapping image filenames to overlays of them.
+_overlays = {}
+
 
 class Align:
 
@@ -59,8 +64,8 @@ class ActiveEvent:
 
 def center_align(w, h):
     """Return coords to align an image in the center of the screen."""
-    return ((pygame.display.get_surface().get_rect().w - w) / 2,
-            (pygame.display.get_surface().get_rect().h - h) / 2)
+    return ((screen.get_surface().get_rect().w - w) / 2,
+            (screen.get_surface().get_rect().h - h) / 2)
 
 
 def text_align(text, coords, align):
@@ -75,16 +80,93 @@ def text_align(text, coords, align):
 
 def render_bezel(label, power_off=False):
     """Render the bezel and label text."""
-    if power_off:
-        bezel = load_image('media/bezel_off.png')
-    else:
-        bezel = load_image('media/bezel.png')
+    filename = 'media/bezel_off.png' if power_off else 'media/bezel.png'
     text = load_font('media/fonts/METRO-DF.TTF', 19).render(
         label, True, (60, 60, 60))
+    return Bezel(_load_overlay(filename), text,
+                 text_align(text, (725, 570), Align.CENTER))
+
+
+def _load_overlay(filename):
+    """Load an image as an overlay, sharing it between everything using it."""
+    if filename not in _overlays:
+        _overlays[filename] = Overlay(load_image(filename))
+    return _overlays[filename]
+
+
+class Bezel:
+
+    """
+    The monitor bezel, with a label.
+
+    The bezel image is the size of the screen, so only one overlay of it is
+    kept, however many terminals are showing it. The label is drawn over it
+    separately, where the bezel is opaque.
 
-    # Copy the bezel surface so we don't overwrite the stored cached surface in
-    # the media manager.
-    surf = bezel.copy()
-    surf.blit(text, text_align(text, (725, 570), Align.CENTER))
+    """
+
+    def __init__(self, overlay, label, label_pos):
+        """Initialize the class."""
+        self._overlay = overlay
+        self._label = label
+        self._label_rect = label.get_rect().move(label_pos)
+
+    def draw(self):
+        """Draw the bezel over the whole of the screen."""
+        self._overlay.draw()
+        if (screen.composing() or
+                screen.get_surface().get_clip().colliderect(self._label_rect)):
+            screen.compose(self._label, self._label_rect)
+
+
+class Overlay:
+
+    """
+    A full screen image that is mostly transparent, such as the bezel.
+
+    Blitting a per-pixel alpha image costs the same for transparent pixels as
+    for visible ones. The image is split into tiles up front, and only the
+    tiles with visible pixels are kept, so drawing it skips the transparent
+    areas, and anything outside the clip rect. The renderer draws the same
+    tiles, from the texture it keeps the image in, but draws them all
+    whatever the clip rect is.
+
+    """
 
-    return surf
+    _TILE_SIZE = 32
+
+    def __init__(self, image):
+        """Initialize the class."""
+        self.image = image
+
+        # Runs of adjacent visible tiles in each row are merged, to keep the
+        # number of blits down.
+        mask = pygame.mask.from_surface(image, 0)
+        self._areas = []
+        image_rect = image.get_rect()
+        for y_coord in range(0, image_rect.h, Overlay._TILE_SIZE):
+            run = None
+            for x_coord in range(0, image_rect.w, Overlay._TILE_SIZE):
+                tile = pygame.Rect(x_coord, y_coord, Overlay._TILE_SIZE,
+                                   Overlay._TILE_SIZE).clip(image_rect)
+                tile_mask = pygame.mask.Mask(tile.size, fill=True)
+                if mask.overlap(tile_mask, tile.topleft) is None:
+                    run = None
+                elif run is None:
+                    run = tile
+                    self._areas.append(run)
+                else:
+                    run.union_ip(tile)
+
+    def draw(self):
+        """Draw the image over the whole of the screen."""
+        if screen.composing():
+            for area in self._areas:
+                screen.compose(self.image, area, area)
+            return
+
+        surface = screen.get_surface()
+        clip = surface.get_clip()
+        surface.blits([(self.image, a, a) for a in self._areas
+                       if clip.colliderect(a)],
+                      doreturn=False)